@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+This module implements an analysis of the features a document uses.
+
+The analysis is used to plan the compiler passes, and to find the default
+packages a document does not need.
+
+LaTeX needs more than one pass when the output of a pass is read back by the
+next one, for instance for references, the last page number or a table of
+contents. Documents that use none of these are complete after a single pass,
+even though the compiler may still ask for a rerun, for instance because the
+``lastpage`` package or a `~.Label` wrote to the aux file.
+
+..  :license: MIT, see License for more details.
+"""
+
+import re
+
+from .base_classes import CommandBase, LatexObject
+from .labelref import Hyperref, Label, RefLabelBase
+from .package import Package
+from .section import Section
+from .utils import _walk
+
+#: Features that are only correct after the aux files of a previous pass were
+#: read.
+multi_pass_features = frozenset(
+    [
+        "references",
+        "last page",
+        "table of contents",
+        "citations",
+        "outlines",
+    ]
+)
+
+_features_of_commands = {
+    "ref": "references",
+    "pageref": "references",
+    "eqref": "references",
+    "cref": "references",
+    "Cref": "references",
+    "autoref": "references",
+    "nameref": "references",
+    "vref": "references",
+    "hyperref": "references",
+    "label": "labels",
+    "tableofcontents": "table of contents",
+    "listoffigures": "table of contents",
+    "listoftables": "table of contents",
+    "cite": "citations",
+    "nocite": "citations",
+    "citep": "citations",
+    "citet": "citations",
+    "autocite": "citations",
+    "parencite": "citations",
+    "textcite": "citations",
+    "bibliography": "citations",
+    "printbibliography": "citations",
+}
+
+#: Text commands that work without ``fontenc`` and ``textcomp``.
+_basic_text_commands = frozenset(
+    [
+        "text",
+        "textbf",
+        "textit",
+        "textsl",
+        "textsc",
+        "texttt",
+        "textrm",
+        "textsf",
+        "textmd",
+        "textup",
+        "textnormal",
+        "textcolor",
+        "textwidth",
+        "textheight",
+        "textsuperscript",
+        "textsubscript",
+        "textasciitilde",
+        "textasciicircum",
+        "textbackslash",
+    ]
+)
+
+#: Characters that are different glyphs in the OT1 encoding that is used
+#: without ``fontenc``.
+_ot1_characters = frozenset('<>|"')
+
+_text_command_regex = re.compile(r"\\(text[A-Za-z]*)")
+_command_regex = re.compile(r"\\([A-Za-z]+)\*?(?:\{([^{}]*)\})?")
+
+
+class CompilePlan:
+    """How many passes a document needs, based on the features it uses."""
+
+    def __init__(self, features):
+        """
+        Args
+        ----
+        features: iterable
+            The names of the features the document uses, such as
+            ``"references"``, ``"last page"`` or ``"labels"``.
+        """
+
+        #: The names of the features the document uses.
+        self.features = frozenset(features)
+
+    @property
+    def multi_pass(self):
+        """bool: Whether the document needs more than one pass."""
+
+        return bool(self.features & multi_pass_features)
+
+    @property
+    def passes(self):
+        """int: The maximum number of passes, `None` if it is not limited."""
+
+        return None if self.multi_pass else 1
+
+    def __repr__(self):
+        return "<CompilePlan {} {}>".format(
+            "multi-pass" if self.multi_pass else "single-pass",
+            sorted(self.features),
+        )
+
+
+def _package_name(package):
+    return str(package.arguments._positional_args[0])
+
+
+def _features_of_string(string):
+    features = set()
+
+    for name, argument in _command_regex.findall(string):
+        feature = _features_of_commands.get(name)
+        if feature == "references" and argument == "LastPage":
+            feature = "last page"
+        if feature is not None:
+            features.add(feature)
+
+    return features
+
+
+def compile_plan(document):
+    r"""Determine how many passes a document needs from its content.
+
+    The document, its preamble and its variables are searched for `~.Ref`,
+    `~.Label` and the other classes of `~.labelref`, for labels of sections,
+    and for commands like ``\pageref{LastPage}``, ``\tableofcontents`` and
+    ``\cite`` in strings. The bookmarks of ``hyperref`` also need another pass
+    when the document has sections.
+
+    Args
+    ----
+    document: `~.Document`
+        The document to analyze.
+
+    Returns
+    -------
+    CompilePlan
+
+    Examples
+    --------
+    >>> import pylatex
+    >>> doc = pylatex.Document()
+    >>> with doc.create(pylatex.Section("Results")):
+    >>>     doc.append("Nothing to refer to.")
+    >>> compile_plan(doc)
+    <CompilePlan single-pass ['labels']>
+    >>> doc.append(pylatex.Ref("sec:results"))
+    >>> compile_plan(doc).passes is None
+    True
+    """
+
+    features = set()
+    packages = set(document.packages)
+    sections = False
+
+    roots = [document] + list(document.preamble) + list(document.variables)
+
+    for root in roots:
+        for item in _walk(root):
+            if isinstance(item, str):
+                features |= _features_of_string(item)
+                continue
+
+            if isinstance(item, LatexObject):
+                packages |= item.packages
+
+            if isinstance(item, (Hyperref, RefLabelBase)):
+                if isinstance(item, Label):
+                    features.add("labels")
+                elif str(item.marker) == "LastPage":
+                    features.add("last page")
+                else:
+                    features.add("references")
+            elif isinstance(item, Section):
+                sections = True
+                if item.label is not None:
+                    features.add("labels")
+            elif isinstance(item, CommandBase) and not isinstance(item, Package):
+                feature = _features_of_commands.get(item.latex_name)
+                if feature is not None:
+                    features.add(feature)
+
+    if sections and any(
+        isinstance(p, Package) and _package_name(p) == "hyperref" for p in packages
+    ):
+        features.add("outlines")
+
+    return CompilePlan(features)
+
+
+def unused_packages(document):
+    r"""Find the default packages of a document that its content doesn't need.
+
+    This is checked for ``fontenc``, ``inputenc``, ``lmodern``, ``textcomp``
+    and ``lastpage``, the packages `~.Document` loads by default. The other
+    packages are added by the classes that need them, or change the layout,
+    like ``parskip`` and ``microtype``, so they are kept.
+
+    - ``lastpage`` is needed if the last page is referenced.
+    - ``inputenc`` is needed for characters that are not ASCII.
+    - ``fontenc`` is needed for those characters too, and for ``<``, ``>``,
+      ``|`` and ``"``, which are other glyphs without it. The analysis does
+      not know which text is math, so it also keeps the package for these
+      characters in formulas.
+    - ``lmodern`` is needed with ``fontenc``, for scalable fonts.
+    - ``textcomp`` is needed for characters that are not ASCII and for text
+      symbols like ``\texteuro``.
+
+    Args
+    ----
+    document: `~.Document`
+        The document to analyze, with all its content.
+
+    Returns
+    -------
+    list
+        The `~.Package` objects that can be removed.
+
+    Examples
+    --------
+    >>> import pylatex
+    >>> doc = pylatex.Document()
+    >>> doc.append("Plain text")
+    >>> for package in unused_packages(doc):
+    >>>     print(package.dumps())
+    \usepackage[T1]{fontenc}
+    \usepackage[utf8]{inputenc}
+    \usepackage{lmodern}
+    \usepackage{textcomp}
+    \usepackage{lastpage}
+    >>> doc.append("Caf\u00e9 <3")
+    >>> for package in unused_packages(doc):
+    >>>     print(package.dumps())
+    \usepackage{lastpage}
+    """
+
+    text = document.dumps()
+    packages = [p for p in document.packages if isinstance(p, Package)]
+    names = [_package_name(p) for p in packages]
+
+    ascii_text = text.isascii()
+    text_commands = set(_text_command_regex.findall(text)) - _basic_text_commands
+
+    unused = set()
+    if ascii_text:
+        unused.add("inputenc")
+        if not _ot1_characters.intersection(text):
+            unused.add("fontenc")
+        if not text_commands:
+            unused.add("textcomp")
+    if "fontenc" in unused or "fontenc" not in names:
+        unused.add("lmodern")
+    if "last page" not in compile_plan(document).features:
+        unused.add("lastpage")
+
+    return [p for p, name in zip(packages, names) if name in unused]
@@ -175,7 +175,16 @@ class Environment(Container):
         if not content.strip() and self.omit_if_empty:
             return ""
 
-        string = ""
+        string = self._dumps_begin() + self.content_separator
+
+        string += content + self.content_separator
+
+        string += self._dumps_end()
+
+        return string
+
+    def _dumps_begin(self):
+        r"""Represent the ``\begin`` command of the environment."""
 
         # Something other than None needs to be used as extra arguments, that
         # way the options end up behind the latex_name argument.
@@ -188,13 +197,12 @@ class Environment(Container):
             "begin", self.start_arguments, self.options, extra_arguments=extra_arguments
         )
         begin.arguments._positional_args.insert(0, self.latex_name)
-        string += begin.dumps() + self.content_separator
+        return begin.dumps()
 
-        string += content + self.content_separator
+    def _dumps_end(self):
+        r"""Represent the ``\end`` command of the environment."""
 
-        string += Command("end", self.latex_name).dumps()
-
-        return string
+        return Command("end", self.latex_name).dumps()
 
 
 class Fragment(Container):
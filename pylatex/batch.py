@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+This module implements the compilation of many documents at the same time.
+
+A LaTeX compiler only uses a single core, so documents are compiled in
+separate worker processes. The number of workers is bounded and jobs with a
+higher priority are started first. The timeout of a job is passed on to the
+compiler, so the worker kills its compiler when the job takes too long. If
+the worker does not finish shortly after that, it is killed as well, on
+POSIX together with the other processes in its process group.
+
+..  :license: MIT, see License for more details.
+"""
+
+import errno
+import heapq
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import time
+import traceback
+
+from .errors import CompilerError, CompilerTimeoutError
+from .figure import wait_for_plots
+from .utils import TempWorkspace
+
+
+class Job:
+    """A document that should be compiled by `compile_documents`."""
+
+    def __init__(
+        self,
+        document,
+        filepath=None,
+        *,
+        priority=0,
+        timeout=None,
+        memory_limit=None,
+        retries=None,
+        **kwargs
+    ):
+        """
+        Args
+        ----
+        document: `~.Document` or callable
+            The document to compile, or a function without arguments that
+            creates it. A function is called in the worker process, so the
+            documents are also created in parallel.
+        filepath: str
+            The name of the file (without .pdf), if it is `None` the
+            ``default_filepath`` of the document is used.
+        priority: int
+            Jobs with a higher priority are started first.
+        timeout: float
+            The number of seconds after which the job is killed. Overrides the
+            timeout of `compile_documents`.
+        memory_limit: int
+            The maximum size in bytes of the address space of the worker and
+            the compiler. Overrides the memory limit of `compile_documents`.
+        retries: int
+            How often the job is tried again after a transient failure.
+            Overrides the retries of `compile_documents`.
+        kwargs:
+            Keyword arguments that are passed to `~.Document.generate_pdf`.
+        """
+
+        self.document = document
+        self.filepath = filepath
+        self.priority = priority
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.retries = retries
+        self.kwargs = kwargs
+
+
+class JobResult:
+    """The outcome of a `Job`."""
+
+    def __init__(self, job):
+        """
+        Args
+        ----
+        job: `Job`
+            The job this is the result of.
+        """
+
+        #: The job this is the result of.
+        self.job = job
+        #: The exception of the last attempt, or `None` if it succeeded.
+        self.error = None
+        #: The traceback of the error as a string, if it happened in a worker.
+        self.traceback = None
+        #: The number of times the job was started.
+        self.attempts = 0
+        #: The seconds it took to create the document in the last attempt.
+        self.render_time = None
+        #: The seconds it took to generate the PDF in the last attempt.
+        self.compile_time = None
+        #: The seconds between submitting the job and its last attempt ending.
+        self.total_time = None
+
+    @property
+    def succeeded(self):
+        """bool: Whether the PDF was generated."""
+
+        return self.attempts > 0 and self.error is None
+
+    def __repr__(self):
+        return "<JobResult {} attempts={} error={!r}>".format(
+            "succeeded" if self.succeeded else "failed", self.attempts, self.error
+        )
+
+
+def _limit_memory(memory_limit):
+    import resource
+
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+# The seconds a worker gets after the timeout of its job to kill its compiler
+_timeout_grace = 1.0
+
+
+def _run_job(job, timeout, memory_limit, connection):
+    """Build a job in the worker process and send the outcome back."""
+
+    started = time.monotonic()
+
+    if os.name == "posix":
+        # Start a new process group, so the compiler is killed with the worker
+        os.setpgrp()
+
+    if memory_limit is not None:
+        _limit_memory(memory_limit)
+
+    render_time = compile_time = None
+
+    try:
+        with TempWorkspace(prefix="pylatex-batch.").use():
+            start = time.perf_counter()
+
+            document = job.document
+            if callable(document):
+                document = document()
+            else:
+                # The parent owns the workspace of an existing document
+                document._workspace_finalizer.detach()
+
+            render_time = time.perf_counter() - start
+            start = time.perf_counter()
+
+            # The compiler runs in its own session, so killing the worker
+            # would not stop it.
+            kwargs = dict(job.kwargs)
+            if timeout is not None:
+                remaining = max(timeout - (time.monotonic() - started), 0)
+                if kwargs.get("timeout") is None or kwargs["timeout"] > remaining:
+                    kwargs["timeout"] = remaining
+            if memory_limit is not None and kwargs.get("memory_limit") is None:
+                kwargs["memory_limit"] = memory_limit
+
+            document.generate_pdf(job.filepath, **kwargs)
+
+            compile_time = time.perf_counter() - start
+    except BaseException as e:
+        try:
+            connection.send((e, traceback.format_exc(), render_time, compile_time))
+        except Exception:
+            # The exception can not be pickled
+            error = CompilerError("{}: {}".format(type(e).__name__, e))
+            connection.send((error, traceback.format_exc(), render_time, compile_time))
+    else:
+        connection.send((None, None, render_time, compile_time))
+    finally:
+        connection.close()
+
+
+class _WorkerDied(CompilerError):
+    """Error for a worker process that exited without a result."""
+
+
+def _is_transient(error):
+    """Check if a failed job could succeed when it is tried again."""
+
+    if isinstance(error, (CompilerTimeoutError, _WorkerDied)):
+        return True
+
+    return isinstance(error, OSError) and error.errno not in (
+        errno.ENOENT,
+        errno.EACCES,
+    )
+
+
+def _kill(process):
+    if os.name != "posix":
+        process.kill()
+        return
+
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        process.kill()
+
+
+def compile_documents(
+    jobs, *, max_workers=None, timeout=None, memory_limit=None, retries=1
+):
+    """Compile many documents in parallel worker processes.
+
+    Failures don't stop the other jobs, they are reported in the results.
+    Only transient failures are retried: timeouts, workers that were killed,
+    for instance because they ran out of memory, and operating system errors.
+    LaTeX errors in a document are not retried.
+
+    On systems that can fork, documents don't have to be picklable. Otherwise
+    the jobs are sent to the workers with `pickle`.
+
+    Args
+    ----
+    jobs: iterable
+        The jobs to run. Every item is a `Job`, a `~.Document` or a function
+        that creates a document.
+    max_workers: int
+        The maximum number of jobs that run at the same time. If it is `None`
+        the number of CPUs is used.
+    timeout: float
+        The default number of seconds after which a job is killed.
+    memory_limit: int
+        The default maximum size in bytes of the address space of every
+        worker and its compiler. Memory limits are only supported on POSIX
+        systems, elsewhere `ValueError` is raised.
+    retries: int
+        The default number of times a job is tried again after a transient
+        failure.
+
+    Returns
+    -------
+    list
+        A `JobResult` for every job, in the same order as the jobs.
+
+    Examples
+    --------
+    >>> import functools
+    >>> import tempfile
+    >>> import pylatex
+    >>> directory = tempfile.mkdtemp()
+    >>> def statement(customer):
+    >>>     doc = pylatex.Document()
+    >>>     doc.append(customer)
+    >>>     return doc
+    >>> results = compile_documents(
+    >>>     Job(
+    >>>         functools.partial(statement, customer),
+    >>>         os.path.join(directory, customer),
+    >>>         timeout=60,
+    >>>     )
+    >>>     for customer in ["alice", "bob"]
+    >>> )
+    >>> failed = [result for result in results if not result.succeeded]
+    """
+
+    jobs = [job if isinstance(job, Job) else Job(job) for job in jobs]
+    results = [JobResult(job) for job in jobs]
+
+    if os.name != "posix" and (
+        memory_limit is not None or any(job.memory_limit is not None for job in jobs)
+    ):
+        raise ValueError("memory_limit is only supported on POSIX")
+
+    if max_workers is None:
+        max_workers = os.cpu_count()
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+
+    # Plots that are saved in the background by the parent can not be waited
+    # for in the workers.
+    wait_for_plots()
+
+    submitted = time.perf_counter()
+    queue = [(-job.priority, index) for index, job in enumerate(jobs)]
+    heapq.heapify(queue)
+    running = {}
+
+    while queue or running:
+        while queue and len(running) < max_workers:
+            _, index = heapq.heappop(queue)
+            job = jobs[index]
+
+            job_memory_limit = job.memory_limit
+            if job_memory_limit is None:
+                job_memory_limit = memory_limit
+            job_timeout = job.timeout if job.timeout is not None else timeout
+
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_run_job, args=(job, job_timeout, job_memory_limit, sender)
+            )
+            process.start()
+            sender.close()
+
+            deadline = None
+            if job_timeout is not None:
+                deadline = time.monotonic() + job_timeout + _timeout_grace
+
+            results[index].attempts += 1
+            running[receiver] = (index, process, deadline)
+
+        deadlines = [d for _, _, d in running.values() if d is not None]
+        wait_time = None
+        if deadlines:
+            wait_time = max(min(deadlines) - time.monotonic(), 0)
+
+        ready = multiprocessing.connection.wait(list(running), timeout=wait_time)
+
+        for receiver in list(running):
+            index, process, deadline = running[receiver]
+            result = results[index]
+
+            if receiver in ready:
+                try:
+                    outcome = receiver.recv()
+                except EOFError:
+                    process.join()
+                    error = _WorkerDied(
+                        "The worker process exited with code {}".format(
+                            process.exitcode
+                        )
+                    )
+                    outcome = (error, None, None, None)
+            elif deadline is not None and time.monotonic() >= deadline:
+                _kill(process)
+                error = CompilerTimeoutError("The job was killed after its timeout")
+                outcome = (error, None, None, None)
+            else:
+                continue
+
+            del running[receiver]
+            receiver.close()
+            process.join()
+
+            error, result.traceback, result.render_time, result.compile_time = outcome
+            result.error = error
+            result.total_time = time.perf_counter() - submitted
+
+            job = result.job
+            job_retries = job.retries if job.retries is not None else retries
+
+            if (
+                error is not None
+                and _is_transient(error)
+                and result.attempts <= job_retries
+            ):
+                heapq.heappush(queue, (-job.priority, index))
+            elif job.kwargs.get("clean", True) and not callable(job.document):
+                job.document._release_workspace()
+
+    return results
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+This module implements the registry of LaTeX compilers.
+
+When no compiler is given, `~.Document.generate_pdf` tries the registered
+compilers in order and uses the first one that is installed. Whether a
+compiler is installed is only looked up once per process, so documents don't
+pay for starting compilers that don't exist.
+
+..  :license: MIT, see License for more details.
+"""
+
+import functools
+import os
+import shutil
+
+_registry = []
+
+
+def register_compiler(name, arguments=None, *, index=None):
+    """Add a compiler that is tried when no compiler is given.
+
+    Registering a compiler again replaces its arguments and position.
+
+    Args
+    ----
+    name: str
+        The name or path of the compiler executable.
+    arguments: list
+        The arguments it gets before the ones of the document.
+    index: int
+        The position at which it is tried, by default after the compilers
+        that are registered already.
+    """
+
+    unregister_compiler(name)
+
+    if index is None:
+        index = len(_registry)
+    _registry.insert(index, (name, list(arguments or [])))
+
+
+def unregister_compiler(name):
+    """Remove a compiler from the registry, if it is registered.
+
+    Args
+    ----
+    name: str
+        The name it was registered with.
+    """
+
+    _registry[:] = [entry for entry in _registry if entry[0] != name]
+
+
+def registered_compilers():
+    """Get the compilers in the order in which they are tried.
+
+    Returns
+    -------
+    list
+        Tuples of the name of each compiler and its arguments.
+    """
+
+    return [(name, list(arguments)) for name, arguments in _registry]
+
+
+@functools.lru_cache(maxsize=None)
+def _which(name, path):
+    return shutil.which(name, path=path)
+
+
+def find_compiler(name):
+    """Look up the executable of a compiler.
+
+    The result is cached for every value of the ``PATH`` environment
+    variable, see `clear_cache`.
+
+    Args
+    ----
+    name: str
+        The name or path of the compiler.
+
+    Returns
+    -------
+    str
+        The path of the executable, `None` if it is not installed.
+    """
+
+    return _which(name, os.environ.get("PATH", os.defpath))
+
+
+def available_compilers():
+    """Get the registered compilers that are installed.
+
+    Returns
+    -------
+    list
+        Tuples of the name of each compiler and its arguments, in the order
+        in which they are tried.
+    """
+
+    return [entry for entry in registered_compilers() if find_compiler(entry[0])]
+
+
+def clear_cache():
+    """Forget which compilers were found, for instance after installing one."""
+
+    _which.cache_clear()
+
+
+register_compiler("latexmk", ["--pdf"])
+# The recorder file lists the files that have to be cleaned up
+register_compiler("pdflatex", ["-recorder"])
@@ -6,13 +6,28 @@ This module implements the class that deals with the full document.
     :license: MIT, see License for more details.
 """
 
+import asyncio
+import collections
 import errno
+import functools
+import hashlib
+import itertools
+import math
 import os
+import posixpath
+import re
+import shutil
+import signal
 import subprocess
-import sys
+import tempfile
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 
 import pylatex.config as cf
 
+from .analysis import compile_plan, unused_packages
 from .base_classes import (
     Command,
     Container,
@@ -21,9 +36,489 @@ from .base_classes import (
     SpecialArguments,
     UnsafeCommand,
 )
-from .errors import CompilerError
+from .compilers import available_compilers
+from .errors import CompilerError, CompilerTimeoutError
+from .externalize import externalize_pictures
+from .figure import StandAloneGraphic, wait_for_plots
+from .formats import build_format, format_dir
+from .log import TeXLog, _pass_extensions, _shipped_pages
 from .package import Package
-from .utils import NoEscape, dumps_list, rm_temp_dir
+from .report import CompileReport
+from .utils import (
+    NoEscape,
+    _active_workspace,
+    _latex_item_to_string,
+    _link_or_copy,
+    _unfix_filename,
+    _walk,
+    _workspace_paths,
+    _write_atomic,
+    cache_dir,
+    current_workspace,
+    dumps_list,
+)
+
+#: The maximum number of times a compiler other than latexmk runs for one
+#: document, when its log asks for a rerun.
+max_passes = 5
+
+#: The number of lines at the end of the output of a compiler pass that are
+#: kept, to show them when it fails.
+_output_tail_lines = 1000
+
+
+class _Build:
+    """The files and compiler commands of a single PDF build."""
+
+    def __init__(self, filepath, build_dir):
+        self.filepath = filepath
+        self.dest_dir = os.path.dirname(filepath)
+        self.build_dir = build_dir
+        self.cached_pdf = None
+        self.cache_hit = False
+        self.commands = []
+        #: A function that returns the pieces of the source for stdin
+        self.source = None
+        self.env = dict(os.environ)
+        self.passes = 0
+        self.max_passes = max_passes
+        self.output = _Output()
+        self.deadline = None
+        self.cpu_time = None
+        self.memory_limit = None
+        #: The `CompileReport` that is filled in, if one was asked for
+        self.report = None
+        #: The hashes of the files that a pass reads back, before the last pass
+        self.pass_files = None
+
+    @property
+    def log_file(self):
+        """The log file the compiler writes."""
+
+        directory = self.build_dir or self.dest_dir
+        return os.path.join(directory, os.path.basename(self.filepath) + ".log")
+
+    def read_pass_files(self):
+        """Get the hashes of the files that LaTeX reads back in the next pass.
+
+        The hash of a file that does not exist is `None`.
+        """
+
+        directory = self.build_dir or self.dest_dir
+        filepath = os.path.join(directory, os.path.basename(self.filepath))
+        paths = [filepath + ext for ext in _pass_extensions]
+        return [_file_digest(path) if os.path.exists(path) else None for path in paths]
+
+    def needs_rerun(self, command):
+        """Check if a compiler that finished has to run again.
+
+        latexmk decides this on its own. Other compilers run again, at most
+        `max_passes` times, when the auxiliary files like the table of
+        contents changed in the last pass, or when the log asks for a rerun.
+        An aux file that was created in the last pass is not a reason, so
+        documents without references are compiled once.
+        """
+
+        self.passes += 1
+        if self.passes >= self.max_passes or os.path.basename(command[0]) == "latexmk":
+            return False
+
+        previous, self.pass_files = self.pass_files, self.read_pass_files()
+        if previous is not None:
+            for extension, before, after in zip(
+                _pass_extensions, previous, self.pass_files
+            ):
+                if before != after and (before is not None or extension != ".aux"):
+                    return True
+
+        try:
+            return TeXLog.from_file(self.log_file).rerun_needed
+        except (OSError, IOError):
+            return False
+
+    def set_limits(self, timeout, cpu_time, memory_limit):
+        """Set the limits of the compiler, the timeout starts now."""
+
+        if os.name != "posix" and (cpu_time is not None or memory_limit is not None):
+            raise ValueError("cpu_time and memory_limit are only supported on POSIX")
+
+        if timeout is not None:
+            self.deadline = time.monotonic() + timeout
+        self.cpu_time = cpu_time
+        self.memory_limit = memory_limit
+
+    def time_left(self):
+        """Get the seconds until the timeout, `None` if there is none."""
+
+        if self.deadline is None:
+            return None
+
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise self.timeout_error("The compiler did not finish in time")
+        return remaining
+
+    def preexec_fn(self):
+        """Get the function that limits the resources of the compiler."""
+
+        if self.cpu_time is None and self.memory_limit is None:
+            return None
+        return functools.partial(_limit_resources, self.cpu_time, self.memory_limit)
+
+    def check_limits(self, returncode):
+        """Raise an error if a compiler that failed exceeded a limit."""
+
+        if returncode == 0:
+            return
+
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise self.timeout_error("The compiler was killed after its timeout")
+
+        if self.cpu_time is not None and returncode in (
+            -signal.SIGXCPU,
+            -signal.SIGKILL,
+        ):
+            raise self.timeout_error(
+                "The compiler was killed after using {} seconds of CPU "
+                "time".format(self.cpu_time)
+            )
+
+    def timeout_error(self, message):
+        """Create the error for a timeout, with the output so far."""
+
+        try:
+            log = TeXLog.from_file(self.log_file)
+        except (OSError, IOError):
+            log = None
+
+        return CompilerTimeoutError(message, b"".join(self.output.tail), log)
+
+
+class _Output:
+    """Passes the output of the compiler on while it runs."""
+
+    def __init__(
+        self, silent=True, callback=None, log=None, progress=None, report=None
+    ):
+        self.silent = silent
+        self.callback = callback
+        self.log = log
+        self.progress = progress
+        self.report = report
+        self.passes = 0
+        self.page = 0
+        self.tail = collections.deque(maxlen=_output_tail_lines)
+        self._log_file = None
+
+    def __enter__(self):
+        if isinstance(self.log, (str, os.PathLike)):
+            self._log_file = open(self.log, "w", encoding="utf-8")
+        else:
+            self._log_file = self.log
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._log_file is not None and self._log_file is not self.log:
+            self._log_file.close()
+        self._log_file = None
+
+    def start_pass(self):
+        self.passes += 1
+        self.page = 0
+        self.tail.clear()
+
+    def write(self, line):
+        """Pass on a line of output, as bytes."""
+
+        self.tail.append(line)
+        text = line.decode(errors="replace")
+
+        if not self.silent:
+            print(text, end="")
+        if self._log_file is not None:
+            self._log_file.write(text)
+        if self.callback is not None:
+            self.callback(text.rstrip("\r\n"))
+        if self.report is not None:
+            self.report._feed_output(text, time.perf_counter())
+
+        if self.progress is not None:
+            for page in _shipped_pages(text):
+                # Numbers in brackets that are not pages are ignored, because
+                # they don't come in order.
+                if page > self.page:
+                    self.page = page
+                    self.progress(self.passes, page)
+
+    def failed(self):
+        """Get the end of the output of a failed pass, printed if silent."""
+
+        output = b"".join(self.tail)
+        if self.silent:
+            print(output.decode(errors="replace"))
+        return output
+
+
+def _limit_resources(cpu_time, memory_limit):
+    """Limit the resources of the current process, in a new compiler."""
+
+    import resource
+
+    if cpu_time is not None:
+        # The compiler gets SIGXCPU at the soft limit and is killed a second
+        # later, if it handles that signal.
+        seconds = int(math.ceil(cpu_time))
+        resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 1))
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def _kill_group(process):
+    """Kill a compiler that started a new session, with its subprocesses.
+
+    Sessions only exist on POSIX, elsewhere only the compiler is killed.
+    """
+
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+def _run_compiler(build, command):
+    """Run the compiler once and pass its output on line by line.
+
+    On POSIX the compiler runs in a new session, so when it takes too long or
+    this is interrupted, the compiler and the processes it started are
+    killed.
+    """
+
+    timeout = build.time_left()
+    build.output.start_pass()
+    start = time.perf_counter()
+
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE if build.source else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        cwd=build.dest_dir,
+        env=build.env,
+        start_new_session=os.name == "posix",
+        preexec_fn=build.preexec_fn(),
+    )
+
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, _kill_group, args=(process,))
+        timer.start()
+
+    feeder = None
+    feeder_errors = []
+    if build.source is not None:
+        # The source is written from a thread, so the compiler never blocks
+        # on a full output pipe while it is still reading its input.
+        feeder = threading.Thread(
+            target=_write_pieces,
+            args=(process, build.source(), feeder_errors),
+            daemon=True,
+        )
+        feeder.start()
+
+    try:
+        with process.stdout:
+            for line in process.stdout:
+                build.output.write(line)
+        returncode = process.wait()
+    except BaseException:
+        _kill_group(process)
+        process.wait()
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if feeder is not None:
+            feeder.join()
+
+    if build.report is not None:
+        build.report._add_pass(time.perf_counter() - start)
+
+    if feeder_errors:
+        raise feeder_errors[0]
+
+    build.check_limits(returncode)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, build.output.failed())
+
+
+async def _run_compiler_async(build, command):
+    """Run the compiler once in an asyncio subprocess.
+
+    The output is passed on while it arrives. When this is cancelled or takes
+    too long, the compiler and the processes it started are killed.
+    """
+
+    timeout = build.time_left()
+    build.output.start_pass()
+    start = time.perf_counter()
+
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=asyncio.subprocess.PIPE if build.source else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        cwd=build.dest_dir,
+        env=build.env,
+        start_new_session=os.name == "posix",
+        preexec_fn=build.preexec_fn()
+    )
+
+    feeder = None
+    if build.source is not None:
+        feeder = asyncio.ensure_future(_feed(process.stdin, build.source()))
+
+    async def communicate():
+        async for line in process.stdout:
+            build.output.write(line)
+        returncode = await process.wait()
+        if feeder is not None:
+            await feeder
+        return returncode
+
+    try:
+        returncode = await asyncio.wait_for(communicate(), timeout)
+    except BaseException as e:
+        if feeder is not None:
+            feeder.cancel()
+        # On POSIX the compiler started a new session, so the whole process
+        # tree can be killed as a group.
+        _kill_group(process)
+        await process.wait()
+        if isinstance(e, asyncio.TimeoutError):
+            raise build.timeout_error(
+                "The compiler was killed after its timeout"
+            ) from None
+        raise
+
+    if build.report is not None:
+        build.report._add_pass(time.perf_counter() - start)
+
+    build.check_limits(returncode)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, build.output.failed())
+
+
+def _tmpfs_dir():
+    """Get a directory in memory for temporary files, if there is one."""
+
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK | os.X_OK):
+        return "/dev/shm"
+    return None
+
+
+def _write_pieces(process, pieces, errors):
+    """Write pieces of text to the stdin of a process and close it.
+
+    An exception while the pieces are generated is added to the errors and
+    the process is killed.
+    """
+
+    try:
+        for piece in pieces:
+            process.stdin.write(piece.encode("utf-8"))
+        process.stdin.close()
+    except BrokenPipeError:
+        # The compiler stopped reading, its exit status tells why
+        pass
+    except BaseException as e:
+        errors.append(e)
+        process.kill()
+
+
+async def _feed(stream, pieces):
+    """Write pieces of text to an asyncio stream and close it."""
+
+    try:
+        for piece in pieces:
+            stream.write(piece.encode("utf-8"))
+            await stream.drain()
+        stream.close()
+    except (BrokenPipeError, ConnectionResetError):
+        # The compiler stopped reading, its exit status tells why
+        pass
+
+
+#: The extensions of auxiliary files that are removed when cleaning up, also
+#: when the compiler wrote no recorder file.
+_auxiliary_extensions = ["aux", "log", "out", "fls", "fdb_latexmk"]
+
+
+def _recorded_outputs(filepath):
+    """Get the files a compiler wrote from its ``.fls`` recorder file.
+
+    Args
+    ----
+    filepath: str
+        The absolute path of the document, without extension.
+
+    Returns
+    -------
+    list
+        The normalized absolute paths, empty if there is no recorder file.
+    """
+
+    directory = os.path.dirname(filepath)
+    outputs = []
+
+    try:
+        with open(filepath + ".fls", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                kind, _, path = line.rstrip("\n").partition(" ")
+                if kind == "PWD":
+                    directory = path
+                elif kind == "OUTPUT":
+                    outputs.append(os.path.normpath(os.path.join(directory, path)))
+    except (OSError, IOError):
+        pass
+
+    return outputs
+
+
+def _file_digest(path):
+    """Get the hash of the content of a file, or of its path if it is missing."""
+
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    except (OSError, IOError):
+        # The compiler will report the missing file
+        digest.update(b"missing\0" + path.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _finish_report(build, start):
+    """Complete the report of a build that is done, if there is one."""
+
+    report = build.report
+    if report is not None:
+        report.total_time = time.perf_counter() - start
+        if build.cache_hit:
+            report.cache_hit = True
+            report.pdf_size = os.path.getsize(build.filepath + ".pdf")
+    return report
+
+
+def _no_compiler_error():
+    return CompilerError(
+        "No LaTex compiler was found\n"
+        "Either specify a LaTex compiler "
+        "or make sure you have latexmk or pdfLaTex installed."
+    )
 
 
 class Document(Environment):
@@ -92,7 +587,8 @@ class Document(Environment):
         page_numbers=True,
         indent=None,
         geometry_options=None,
-        data=None
+        data=None,
+        workspace=None
     ):
         r"""
         Args
@@ -126,10 +622,22 @@ class Document(Environment):
             The options to supply to the geometry package
         data: list
             Initial content of the document.
+        workspace: `~.TempWorkspace`
+            The workspace for temporary files of the document, like saved
+            plots. If it is `None` the current workspace is used, see
+            `~.current_workspace`. The document keeps a reference to it until
+            it is cleaned by `generate_pdf` or garbage collected. It is the
+            current workspace inside `create` and while the document is
+            rendered, so plots that are added there and data files of plots
+            are saved in it.
         """
 
         self.default_filepath = default_filepath
 
+        if workspace is None:
+            workspace = current_workspace()
+        self._hold_workspace(workspace)
+
         if isinstance(documentclass, Command):
             self.documentclass = documentclass
         else:
@@ -213,6 +721,31 @@ class Document(Environment):
                 for p in item.packages:
                     self.packages.add(p)
 
+    @contextmanager
+    def _using_workspace(self):
+        """Make the workspace of the document the current one."""
+
+        token = _active_workspace.set(self.workspace)
+        try:
+            yield
+        finally:
+            _active_workspace.reset(token)
+
+    @contextmanager
+    def create(self, child):
+        """Add a LaTeX object to the document, context-manager style.
+
+        The workspace of the document is the current one inside the context.
+
+        Args
+        ----
+        child: `~.Container`
+            An object to be added to the document
+        """
+
+        with self._using_workspace(), super().create(child) as child:
+            yield child
+
     def dumps(self):
         """Represent the document as a string in LaTeX syntax.
 
@@ -221,16 +754,94 @@ class Document(Environment):
         str
         """
 
-        head = self.documentclass.dumps() + "%\n"
-        head += self.dumps_packages() + "%\n"
-        head += dumps_list(self.variables) + "%\n"
-        head += dumps_list(self.preamble) + "%\n"
+        with self._using_workspace():
+            return self.dumps_preamble() + "%\n" + super().dumps()
+
+    def iter_dumps(self):
+        """Represent the document in LaTeX syntax piece by piece.
+
+        The first piece is the preamble, then every item of the document
+        follows, so the start of the document is available before the rest
+        has been rendered. Joined together, the pieces are equal to `dumps`.
+
+        Returns
+        -------
+        iterator
+            An iterator of strings.
+        """
+
+        yield self.dumps_preamble() + "%\n"
+        yield self._dumps_begin() + self.content_separator
+
+        for i, item in enumerate(self):
+            if i:
+                yield self.content_separator
+            # Only active while rendering, the caller may resume this
+            # generator in another context.
+            with self._using_workspace():
+                piece = _latex_item_to_string(item, escape=self.escape, as_content=True)
+            yield piece
+
+        yield self.content_separator + self._dumps_end()
+
+    def dump(self, file_w):
+        """Write the LaTeX representation of the document to a file.
+
+        The document is written piece by piece, see `iter_dumps`.
+
+        Args
+        ----
+        file_w: io.TextIOBase
+            The file object in which to save the data
+        """
+
+        for string in self.iter_dumps():
+            file_w.write(string)
+
+    def dumps_preamble(self):
+        r"""Represent everything before ``\begin{document}`` as a string.
+
+        This is the document class, the packages, the variables and the
+        preamble.
+
+        Returns
+        -------
+        str
+        """
+
+        with self._using_workspace():
+            head = self.documentclass.dumps() + "%\n"
+            head += self.dumps_packages() + "%\n"
+            head += dumps_list(self.variables) + "%\n"
+            head += dumps_list(self.preamble) + "%\n"
+
+        return head
+
+    def minimize_preamble(self):
+        """Remove the default packages that the content does not need.
 
-        return head + "%\n" + super().dumps()
+        Call this when all content is added, because content that is added
+        later could need the packages again. See `~.unused_packages` for the
+        packages that are checked.
+
+        Returns
+        -------
+        list
+            The `~.Package` objects that were removed.
+        """
+
+        pruned = unused_packages(self)
+        for package in pruned:
+            self.packages.discard(package)
+        return pruned
 
     def generate_tex(self, filepath=None):
         """Generate a .tex file for the document.
 
+        Plots that are rendered in the background are waited for and
+        pictures that should be externalized are compiled first, see
+        `~.wait_for_plots` and `~.externalize_pictures`.
+
         Args
         ----
         filepath: str
@@ -238,7 +849,107 @@ class Document(Environment):
             default filepath attribute is used as the path.
         """
 
-        super().generate_tex(self._select_filepath(filepath))
+        self._write_tex(self._select_filepath(filepath) + ".tex")
+
+    def _prepare_dumps(self):
+        """Create the files the document includes that are made separately."""
+
+        wait_for_plots()
+        externalize_pictures(self, preamble=self.variables + self.preamble)
+
+    def _write_tex(self, filepath):
+        """Write the document to a file, unless it has this content already.
+
+        Leaving an unchanged file alone keeps its modification time, so tools
+        like latexmk don't consider it changed.
+
+        Returns
+        -------
+        str
+            The LaTeX source of the document.
+        """
+
+        self._prepare_dumps()
+        content = self.dumps()
+
+        try:
+            with open(filepath, encoding="utf-8") as f:
+                if f.read() == content:
+                    return content
+        except (OSError, IOError) as e:
+            # Use FileNotFoundError when python 2 is dropped
+            if e.errno != errno.ENOENT:
+                raise
+
+        with open(filepath, "w", encoding="utf-8") as newf:
+            newf.write(content)
+
+        return content
+
+    def _input_files(self, directory):
+        """Get the images that are included by the document."""
+
+        items = itertools.chain(_walk(self), *map(_walk, self.preamble))
+
+        for item in items:
+            if isinstance(item, StandAloneGraphic):
+                path = _unfix_filename(str(item.arguments._positional_args[0]))
+                yield os.path.join(directory, os.path.expanduser(path))
+
+    def _relative_images(self):
+        """Get the images with a relative path that the document includes."""
+
+        paths = set()
+
+        for path in self._input_files(""):
+            if not os.path.isabs(path):
+                paths.add(posixpath.normpath(path))
+
+        return sorted(paths)
+
+    def _build_cache_key(self, content, directory, compilers, compiler_args, options):
+        """Calculate the key of a document in the build cache.
+
+        Temporary workspaces have random names and plots are saved with
+        random file names. The paths of files in workspaces, like plots and
+        their data files, are therefore replaced by a hash of their content,
+        so the same document gets the same key in another process.
+
+        The options are the arguments of `generate_pdf` that change the
+        output, as a dict.
+        """
+
+        workspaces = self._cache_workspaces()
+        for workspace in workspaces:
+            content = re.sub(
+                re.escape(workspace) + r"/[\w.-]+",
+                lambda match: "<workspace>/" + _file_digest(match.group(0)),
+                content,
+            )
+
+        key = hashlib.sha256()
+        key.update(content.encode("utf-8"))
+        key.update(
+            repr((compilers, compiler_args, sorted(options.items()))).encode("utf-8")
+        )
+
+        for path in sorted(set(self._input_files(directory))):
+            if any(path.startswith(w + os.sep) for w in workspaces):
+                # Already part of the content
+                continue
+
+            key.update(b"\0" + path.encode("utf-8") + b"\0")
+            key.update(_file_digest(path).encode("utf-8"))
+
+        return key.hexdigest()
+
+    def _cache_workspaces(self):
+        """Get the workspaces of which files are keyed by their content.
+
+        Nested directories come before the directories that contain them.
+        """
+
+        return _workspace_paths()
 
     def generate_pdf(
         self,
@@ -248,7 +959,20 @@ class Document(Environment):
         clean_tex=True,
         compiler=None,
         compiler_args=None,
-        silent=True
+        silent=True,
+        build_cache=False,
+        build_dir=None,
+        preamble_format=False,
+        stdin=False,
+        plan_passes=False,
+        output_callback=None,
+        output_log=None,
+        progress_callback=None,
+        timeout=None,
+        cpu_time=None,
+        memory_limit=None,
+        report=False,
+        remote=None
     ):
         """Generate a pdf file from the document.
 
@@ -259,120 +983,594 @@ class Document(Environment):
             ``default_filepath`` attribute will be used.
         clean: bool
             Whether non-pdf files created that are created during compilation
-            should be removed.
+            should be removed. This also releases the temporary workspace of
+            the document, also when compiling fails. The workspace is removed
+            when no other document uses it.
         clean_tex: bool
             Also remove the generated tex file.
         compiler: `str` or `None`
             The name of the LaTeX compiler to use. If it is None, PyLaTeX will
-            choose a fitting one on its own. Starting with ``latexmk`` and then
+            choose a fitting one on its own, the first installed compiler of
+            the `~.compilers` registry. By default ``latexmk`` and then
             ``pdflatex``.
         compiler_args: `list` or `None`
             Extra arguments that should be passed to the LaTeX compiler. If
             this is None it defaults to an empty list.
         silent: bool
             Whether to hide compiler output
+        build_cache: bool
+            Whether to use the persistent build cache. The cache is keyed by
+            the LaTeX source, the included images, the compiler with its
+            arguments and the options that change the output, like
+            ``plan_passes``. If the same PDF was built before, it is linked or
+            copied from the cache and no compiler is run.
+        build_dir: `str`, `bool` or `None`
+            A directory in which the compiler writes its output. The files in
+            it are kept between runs, so ``latexmk`` can reuse them and skip
+            passes, ``clean`` does not remove them. If it is `True` a
+            directory per document is used from the PyLaTeX cache. Remove it
+            with `clean_build_dir`.
+        preamble_format: bool
+            Whether to compile with a format file in which the preamble is
+            precompiled, see `~.build_format`. Documents with the same
+            preamble share the format. This needs the ``mylatexformat``
+            package.
+        stdin: bool
+            Whether to write the LaTeX source to the standard input of the
+            compiler while it is rendered, instead of writing a tex file
+            first. The output files are named with ``--jobname``. This does
+            not work with ``latexmk``, so ``pdflatex`` is used by default, and
+            it needs ``/dev/stdin``.
+        plan_passes: bool
+            Whether to determine from the content of the document if more
+            than one pass is needed, see `~.compile_plan`. Documents without
+            references, a table of contents or other features that read the
+            aux file are compiled in a single pass, also by ``latexmk``.
+        output_callback: callable
+            A function that is called with every line of compiler output,
+            without the line ending, while the compiler runs.
+        output_log: `str` or file object
+            A path or text file to which the compiler output is written while
+            it runs.
+        progress_callback: callable
+            A function that is called with the number of the compiler pass,
+            starting at 1, and the number of a page when TeX has shipped it
+            out. ``latexmk`` runs all passes in one process, so for it the
+            page numbers start again without a new pass number.
+        timeout: float
+            The number of seconds after which the compiler is killed, for all
+            passes together. `~.CompilerTimeoutError` is raised, with the
+            output and log so far.
+        cpu_time: float
+            The number of seconds of CPU time a single compiler process may
+            use, after that it is killed and `~.CompilerTimeoutError` is
+            raised.
+        memory_limit: int
+            The maximum size in bytes of the address space of the compiler.
+            A compiler that needs more fails. The limits are only supported
+            on POSIX systems, elsewhere `ValueError` is raised.
+        report: bool
+            Whether to measure the build and return a `~.CompileReport`, with
+            the time of every compiler pass and of loading every package.
+        remote: `str`, `tuple` or `None`
+            The address of a `~.CompileServer` that compiles the document,
+            the path of its Unix socket or its host and port. The server
+            writes no files next to the PDF, so ``clean_tex``, ``build_dir``,
+            ``stdin`` and ``plan_passes`` have no effect. The compiler output
+            is not passed on and the limits are not applied.
+
+        Returns
+        -------
+        `~.CompileReport` or `None`
+            The report of the build, if ``report`` is `True`.
         """
 
-        if compiler_args is None:
-            compiler_args = []
+        try:
+            if remote is not None:
+                from .server import compile_remote
+
+                filepath = self._absolute_filepath(filepath)
+                pdf = compile_remote(
+                    self,
+                    remote,
+                    directory=os.path.dirname(filepath),
+                    compiler=compiler,
+                    compiler_args=compiler_args,
+                    build_cache=build_cache,
+                    preamble_format=preamble_format,
+                )
+                _write_atomic(filepath + ".pdf", pdf)
+
+                if report:
+                    compile_report = CompileReport()
+                    compile_report.pdf_size = len(pdf)
+                    return compile_report
+                return None
+
+            start = time.perf_counter()
+            build = self._plan_build(
+                filepath,
+                compiler=compiler,
+                compiler_args=compiler_args,
+                build_cache=build_cache,
+                build_dir=build_dir,
+                preamble_format=preamble_format,
+                stdin=stdin,
+                plan_passes=plan_passes,
+            )
 
-        # In case of newer python with the use of the cwd parameter
-        # one can avoid to physically change the directory
-        # to the destination folder
-        python_cwd_available = sys.version_info >= (3, 6)
+            if report:
+                build.report = CompileReport()
+                build.report.render_time = time.perf_counter() - start
 
-        filepath = self._select_filepath(filepath)
-        if not os.path.basename(filepath):
-            filepath = os.path.join(os.path.abspath(filepath), "default_basename")
-        else:
-            filepath = os.path.abspath(filepath)
+            if build.cache_hit:
+                self._clean_up_build(build, clean, clean_tex)
+                return _finish_report(build, start)
+
+            build.output = _Output(
+                silent, output_callback, output_log, progress_callback, build.report
+            )
+            build.set_limits(timeout, cpu_time, memory_limit)
+
+            with build.output:
+                for command, output_pdf in build.commands:
+                    try:
+                        _run_compiler(build, command)
+                        while build.needs_rerun(command):
+                            _run_compiler(build, command)
+                    except (OSError, IOError) as e:
+                        # Use FileNotFoundError when python 2 is dropped
+                        if e.errno == errno.ENOENT:
+                            # If compiler does not exist, try next in the list
+                            continue
+                        raise
+
+                    self._finish_build(build, output_pdf, clean, clean_tex)
+                    return _finish_report(build, start)
+
+            raise _no_compiler_error()
+        finally:
+            if clean:
+                self._release_workspace()
+
+    async def generate_pdf_async(
+        self,
+        filepath=None,
+        *,
+        clean=True,
+        clean_tex=True,
+        compiler=None,
+        compiler_args=None,
+        silent=True,
+        build_cache=False,
+        build_dir=None,
+        preamble_format=False,
+        stdin=False,
+        plan_passes=False,
+        output_callback=None,
+        output_log=None,
+        progress_callback=None,
+        timeout=None,
+        cpu_time=None,
+        memory_limit=None,
+        report=False
+    ):
+        """Generate a pdf file from the document without blocking the event loop.
+
+        This works like `generate_pdf`, and takes the same arguments, but the
+        compiler runs as an `asyncio` subprocess. When the task is cancelled,
+        the compiler and all processes it started are killed.
+
+        Creating the tex file, and externalized pictures, still happens
+        synchronously.
+        """
+
+        try:
+            start = time.perf_counter()
+            build = self._plan_build(
+                filepath,
+                compiler=compiler,
+                compiler_args=compiler_args,
+                build_cache=build_cache,
+                build_dir=build_dir,
+                preamble_format=preamble_format,
+                stdin=stdin,
+                plan_passes=plan_passes,
+            )
+
+            if report:
+                build.report = CompileReport()
+                build.report.render_time = time.perf_counter() - start
+
+            if build.cache_hit:
+                self._clean_up_build(build, clean, clean_tex)
+                return _finish_report(build, start)
+
+            build.output = _Output(
+                silent, output_callback, output_log, progress_callback, build.report
+            )
+            build.set_limits(timeout, cpu_time, memory_limit)
+
+            with build.output:
+                for command, output_pdf in build.commands:
+                    try:
+                        await _run_compiler_async(build, command)
+                        while build.needs_rerun(command):
+                            await _run_compiler_async(build, command)
+                    except (OSError, IOError) as e:
+                        if e.errno == errno.ENOENT:
+                            continue
+                        raise
+
+                    self._finish_build(build, output_pdf, clean, clean_tex)
+                    return _finish_report(build, start)
+
+            raise _no_compiler_error()
+        finally:
+            if clean:
+                self._release_workspace()
+
+    def generate_pdf_bytes(
+        self,
+        *,
+        clean=True,
+        compiler=None,
+        compiler_args=None,
+        silent=True,
+        build_cache=False,
+        preamble_format=False,
+        stdin=False,
+        plan_passes=False,
+        output_callback=None,
+        output_log=None,
+        progress_callback=None,
+        timeout=None,
+        cpu_time=None,
+        memory_limit=None
+    ):
+        """Generate a pdf file from the document and return its content.
+
+        The document is compiled in a private temporary directory, in memory
+        if ``/dev/shm`` is available. The images with a relative path are
+        linked or copied into it. The directory is removed afterwards, also
+        when compiling fails.
+
+        Args
+        ----
+        clean: bool
+            Whether to release the temporary workspace of the document.
+        compiler: `str` or `None`
+            The name of the LaTeX compiler to use, see `generate_pdf`.
+        compiler_args: `list` or `None`
+            Extra arguments that should be passed to the LaTeX compiler.
+        silent: bool
+            Whether to hide compiler output
+        build_cache: bool
+            Whether to use the persistent build cache, see `generate_pdf`.
+        preamble_format: bool
+            Whether to use a precompiled preamble, see `generate_pdf`.
+        stdin: bool
+            Whether to pass the source through standard input, see
+            `generate_pdf`.
+        plan_passes: bool
+            Whether to determine the number of passes from the content, see
+            `generate_pdf`.
+        output_callback: callable
+            A function that is called with every line of compiler output.
+        output_log: `str` or file object
+            A path or text file to which the compiler output is written.
+        progress_callback: callable
+            A function that is called with the pass and page number when a
+            page is shipped out.
+        timeout: float
+            The number of seconds after which the compiler is killed.
+        cpu_time: float
+            The number of seconds of CPU time the compiler may use.
+        memory_limit: int
+            The maximum size in bytes of the address space of the compiler.
+
+        Returns
+        -------
+        bytes
+        """
+
+        source_dir = os.path.dirname(self._absolute_filepath(None))
+        images = self._relative_images()
+
+        directory = tempfile.mkdtemp(prefix="pylatex-pdf.", dir=_tmpfs_dir())
+
+        try:
+            # Images in parent directories keep their place relative to the
+            # document, so it is compiled in a subdirectory that deep.
+            levels = max((path.split("/").count("..") for path in images), default=0)
+            document_dir = os.path.join(directory, *["_"] * levels)
+            os.makedirs(document_dir, exist_ok=True)
+
+            for path in images:
+                target = os.path.normpath(os.path.join(document_dir, path))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                try:
+                    _link_or_copy(os.path.join(source_dir, path), target)
+                except FileNotFoundError:
+                    # The compiler reports the missing file
+                    pass
+
+            filepath = os.path.join(document_dir, "document")
+            self.generate_pdf(
+                filepath,
+                clean=False,
+                clean_tex=False,
+                compiler=compiler,
+                compiler_args=compiler_args,
+                silent=silent,
+                build_cache=build_cache,
+                preamble_format=preamble_format,
+                stdin=stdin,
+                plan_passes=plan_passes,
+                output_callback=output_callback,
+                output_log=output_log,
+                progress_callback=progress_callback,
+                timeout=timeout,
+                cpu_time=cpu_time,
+                memory_limit=memory_limit,
+            )
+
+            with open(filepath + ".pdf", "rb") as f:
+                return f.read()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+            if clean:
+                self._release_workspace()
+
+    def _plan_build(
+        self,
+        filepath,
+        *,
+        compiler,
+        compiler_args,
+        build_cache,
+        build_dir,
+        preamble_format,
+        stdin,
+        plan_passes
+    ):
+        """Write the tex file and determine how the PDF has to be built.
+
+        If the PDF is in the build cache it is placed right away and
+        ``cache_hit`` is set.
+
+        Returns
+        -------
+        _Build
+        """
 
-        cur_dir = os.getcwd()
+        if compiler_args is None:
+            compiler_args = []
+
+        filepath = self._absolute_filepath(filepath)
         dest_dir = os.path.dirname(filepath)
 
-        if not python_cwd_available:
-            os.chdir(dest_dir)
+        if build_dir is True:
+            build_dir = self._managed_build_dir(filepath)
+        if build_dir is not None:
+            build_dir = os.path.abspath(build_dir)
+            os.makedirs(build_dir, exist_ok=True)
 
-        self.generate_tex(filepath)
+        if stdin:
+            self._prepare_dumps()
+            content = self.dumps() if build_cache else None
+        else:
+            content = self._write_tex(filepath + ".tex")
 
         if compiler is not None:
+            if stdin and os.path.basename(compiler) == "latexmk":
+                raise ValueError("latexmk can not read the source from stdin")
             compilers = ((compiler, []),)
+        elif stdin:
+            compilers = (("pdflatex", []),)
         else:
-            latexmk_args = ["--pdf"]
+            compilers = tuple(available_compilers())
 
-            compilers = (("latexmk", latexmk_args), ("pdflatex", []))
+        build = _Build(filepath, build_dir)
 
-        main_arguments = ["--interaction=nonstopmode", filepath + ".tex"]
+        single_pass = False
+        if plan_passes:
+            single_pass = compile_plan(self).passes == 1
+            if single_pass:
+                build.max_passes = 1
 
-        check_output_kwargs = {}
-        if python_cwd_available:
-            check_output_kwargs = {"cwd": dest_dir}
+        if stdin:
+            if content is None:
+                build.source = self.iter_dumps
+            else:
+                build.source = lambda: [content]
+
+        if build_cache:
+            # A single pass can leave references unresolved, and a format or
+            # the standard input changes the file names TeX reports.
+            options = {
+                "plan_passes": plan_passes,
+                "preamble_format": preamble_format,
+                "stdin": stdin,
+            }
+            key = self._build_cache_key(
+                content, dest_dir, compilers, compiler_args, options
+            )
+            build.cached_pdf = os.path.join(cache_dir("pdf"), key + ".pdf")
+
+            if os.path.exists(build.cached_pdf):
+                _link_or_copy(build.cached_pdf, filepath + ".pdf")
+                build.cache_hit = True
+                return build
+
+        try:
+            if os.stat(filepath + ".pdf").st_nlink > 1:
+                # The PDF is linked from the build cache, the compiler would
+                # overwrite the cached file as well.
+                os.remove(filepath + ".pdf")
+        except (OSError, IOError) as e:
+            # Use FileNotFoundError when python 2 is dropped
+            if e.errno != errno.ENOENT:
+                raise
 
-        os_error = None
+        if stdin:
+            main_arguments = [
+                "--interaction=nonstopmode",
+                "--jobname=" + os.path.basename(filepath),
+                "/dev/stdin",
+            ]
+        else:
+            main_arguments = ["--interaction=nonstopmode", filepath + ".tex"]
 
         for compiler, arguments in compilers:
-            command = [compiler] + arguments + compiler_args + main_arguments
-
-            try:
-                output = subprocess.check_output(
-                    command, stderr=subprocess.STDOUT, **check_output_kwargs
+            command = [compiler] + arguments + compiler_args
+            output_pdf = filepath + ".pdf"
+
+            if preamble_format:
+                if os.path.basename(compiler) == "latexmk":
+                    name = build_format(self.dumps_preamble(), "pdflatex")
+                    command.append("-pdflatex=pdflatex -fmt={} %O %S".format(name))
+                else:
+                    name = build_format(self.dumps_preamble(), compiler)
+                    command.append("-fmt=" + name)
+
+                # Also search the default formats
+                build.env["TEXFORMATS"] = format_dir() + os.pathsep
+
+            if build_dir is not None:
+                if os.path.basename(compiler) == "latexmk":
+                    command.append("-outdir=" + build_dir)
+                else:
+                    command.append("--output-directory=" + build_dir)
+                output_pdf = os.path.join(
+                    build_dir, os.path.basename(filepath) + ".pdf"
                 )
-            except (OSError, IOError) as e:
-                # Use FileNotFoundError when python 2 is dropped
-                os_error = e
 
-                if os_error.errno == errno.ENOENT:
-                    # If compiler does not exist, try next in the list
-                    continue
-                raise
-            except subprocess.CalledProcessError as e:
-                # For all other errors print the output and raise the error
-                print(e.output.decode())
-                raise
-            else:
-                if not silent:
-                    print(output.decode())
+            if single_pass and os.path.basename(compiler) == "latexmk":
+                command += ["-e", "$max_repeat=1"]
 
-            if clean:
-                try:
-                    # Try latexmk cleaning first
-                    subprocess.check_output(
-                        ["latexmk", "-c", filepath],
-                        stderr=subprocess.STDOUT,
-                        **check_output_kwargs
-                    )
-                except (OSError, IOError, subprocess.CalledProcessError):
-                    # Otherwise just remove some file extensions.
-                    extensions = ["aux", "log", "out", "fls", "fdb_latexmk"]
-
-                    for ext in extensions:
-                        try:
-                            os.remove(filepath + "." + ext)
-                        except (OSError, IOError) as e:
-                            # Use FileNotFoundError when python 2 is dropped
-                            if e.errno != errno.ENOENT:
-                                raise
-                rm_temp_dir()
-
-            if clean_tex:
-                os.remove(filepath + ".tex")  # Remove generated tex file
-
-            # Compilation has finished, so no further compilers have to be
-            # tried
-            break
+            build.commands.append((command + main_arguments, output_pdf))
+
+        build.pass_files = build.read_pass_files()
+        return build
+
+    def _finish_build(self, build, output_pdf, clean, clean_tex):
+        """Put the compiled PDF in place and remove files that are left."""
 
+        if build.build_dir is not None:
+            # The PDF is copied, because latexmk builds it again when it is
+            # missing from the build directory and would write into a linked
+            # file.
+            _link_or_copy(output_pdf, build.filepath + ".pdf", link=False)
+
+        if build.cached_pdf is not None:
+            _link_or_copy(build.filepath + ".pdf", build.cached_pdf)
+
+        if build.report is not None:
+            build.report._read_results(build.log_file, build.filepath + ".pdf")
+
+        self._clean_up_build(build, clean, clean_tex)
+
+    def _clean_up_build(self, build, clean, clean_tex):
+        """Remove the files that are left after a build, see `_clean_up`."""
+
+        # In stdin mode no tex file was written
+        clean_tex = clean_tex and build.source is None
+        self._clean_up(build.filepath, clean, clean_tex, build.build_dir)
+
+    def _clean_up(self, filepath, clean, clean_tex, build_dir=None):
+        """Remove the files that are left after compiling a document.
+
+        Args
+        ----
+        filepath: str
+            The absolute path of the document, without extension.
+        clean: bool
+            Whether to remove the auxiliary files and release the temporary
+            workspace.
+        clean_tex: bool
+            Whether to remove the generated tex file.
+        build_dir: str
+            The build directory that was used. Its files are never removed.
+        """
+
+        if clean:
+            self._release_workspace()
+
+        if clean and build_dir is None:
+            paths = {filepath + "." + ext for ext in _auxiliary_extensions}
+
+            # Remove the files the compiler recorded as its output as well,
+            # when they are next to the document.
+            directory = os.path.dirname(filepath)
+            for path in _recorded_outputs(filepath):
+                if os.path.dirname(path) == directory:
+                    paths.add(path)
+            paths -= {filepath + ".pdf", filepath + ".tex"}
+
+            for path in paths:
+                try:
+                    os.remove(path)
+                except (OSError, IOError) as e:
+                    # Use FileNotFoundError when python 2 is dropped
+                    if e.errno != errno.ENOENT:
+                        raise
+
+        if clean_tex:
+            os.remove(filepath + ".tex")  # Remove generated tex file
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_workspace_finalizer"] = self._workspace_finalizer.alive
+        return state
+
+    def __setstate__(self, state):
+        holds_workspace = state.pop("_workspace_finalizer")
+        self.__dict__.update(state)
+        if holds_workspace:
+            # Copies hold their own reference to the workspace
+            self._hold_workspace(self.workspace)
         else:
-            # Notify user that none of the compilers worked.
-            raise (
-                CompilerError(
-                    "No LaTex compiler was found\n"
-                    "Either specify a LaTex compiler "
-                    "or make sure you have latexmk or pdfLaTex installed."
-                )
-            )
+            self._workspace_finalizer = weakref.finalize(self, self.workspace.release)
+            self._workspace_finalizer.detach()
+
+    def _hold_workspace(self, workspace):
+        """Reference the workspace until it is released or garbage collected."""
+
+        self.workspace = workspace.acquire()
+        self._workspace_finalizer = weakref.finalize(self, workspace.release)
+
+    def _release_workspace(self):
+        self._workspace_finalizer()
+
+    def _absolute_filepath(self, filepath):
+        """Get the absolute path of the output files, without extension."""
+
+        filepath = self._select_filepath(filepath)
+        if not os.path.basename(filepath):
+            return os.path.join(os.path.abspath(filepath), "default_basename")
+        return os.path.abspath(filepath)
+
+    def _managed_build_dir(self, filepath):
+        """Get the build directory in the cache for an absolute filepath."""
+
+        key = hashlib.sha256(filepath.encode("utf-8")).hexdigest()[:16]
+        name = "{}-{}".format(os.path.basename(filepath), key)
+        return os.path.join(cache_dir("build"), name)
+
+    def clean_build_dir(self, filepath=None):
+        """Remove the build directory that ``build_dir=True`` uses.
+
+        Args
+        ----
+        filepath: str
+            The name of the file (without .pdf) that was passed to
+            `generate_pdf`, if it is `None` the ``default_filepath``
+            attribute will be used.
+        """
 
-        if not python_cwd_available:
-            os.chdir(cur_dir)
+        build_dir = self._managed_build_dir(self._absolute_filepath(filepath))
+        shutil.rmtree(build_dir, ignore_errors=True)
 
     def _select_filepath(self, filepath):
         """Make a choice between ``filepath`` and ``self.default_filepath``.
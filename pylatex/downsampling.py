@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+This module implements functions to reduce the number of points in a series.
+
+A printed page can not show more detail than its resolution allows, so a
+series with millions of points only costs compile time and memory. The
+functions in this module select the points that are visually relevant. They
+return indices, so that other data belonging to the points (such as error
+bars) can be selected in the same way.
+
+These functions need numpy to be installed.
+
+..  :license: MIT, see License for more details.
+"""
+
+#: The width in inches that is assumed for a figure when none is given. This
+#: is roughly the text width of an A4 or letter page.
+DEFAULT_TARGET_WIDTH = 6.0
+
+#: The resolution in dots per inch that is assumed for printed output.
+DEFAULT_DPI = 300
+
+
+def max_points_for_width(width=None, dpi=None):
+    """Calculate the number of points that can be shown at a certain width.
+
+    Args
+    ----
+    width: float
+        The width in inches the series will be printed at. Defaults to
+        `DEFAULT_TARGET_WIDTH`.
+    dpi: int
+        The resolution of the output. Defaults to `DEFAULT_DPI`.
+
+    Returns
+    -------
+    int
+
+    Examples
+    --------
+    >>> max_points_for_width()
+    1800
+    >>> max_points_for_width(2, dpi=150)
+    300
+    """
+
+    if width is None:
+        width = DEFAULT_TARGET_WIDTH
+    if dpi is None:
+        dpi = DEFAULT_DPI
+
+    return int(width * dpi)
+
+
+def tolerance_for_width(dpi=None, unit_in_inches=1 / 2.54):
+    """Calculate a tolerance that removes details smaller than a dot.
+
+    Args
+    ----
+    dpi: int
+        The resolution of the output. Defaults to `DEFAULT_DPI`.
+    unit_in_inches: float
+        The size of one coordinate unit in inches, by default this is a
+        centimeter, which is the default unit of TikZ.
+
+    Returns
+    -------
+    float
+        Half the size of a dot, expressed in coordinate units.
+    """
+
+    if dpi is None:
+        dpi = DEFAULT_DPI
+
+    return 0.5 / dpi / unit_in_inches
+
+
+def _as_xy(x, y=None):
+    import numpy as np
+
+    if y is None:
+        points = np.asarray(x, dtype=float).reshape(-1, 2)
+        return points[:, 0], points[:, 1]
+
+    return np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+
+def lttb_indices(x, y=None, n_out=None):
+    """Select points using the Largest-Triangle-Three-Buckets algorithm.
+
+    The first and last point are always kept. The points in between are
+    split up into equal buckets and of every bucket the point that forms the
+    largest triangle with the previously selected point and the average of
+    the next bucket is selected.
+
+    Args
+    ----
+    x: array_like
+        The x values, or an array of shape (N, 2) if ``y`` is `None`.
+    y: array_like
+        The y values.
+    n_out: int
+        The number of points to keep. Defaults to `max_points_for_width`.
+
+    Returns
+    -------
+    numpy.ndarray
+        The sorted indices of the selected points.
+
+    Examples
+    --------
+    >>> lttb_indices([0, 1, 2, 3, 4], [0, 5, 0, 0, 0], 3).tolist()
+    [0, 1, 4]
+    """
+
+    import numpy as np
+
+    x, y = _as_xy(x, y)
+    n = len(x)
+
+    if n_out is None:
+        n_out = max_points_for_width()
+
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+
+        if i + 2 < len(edges):
+            next_x = x[end : edges[i + 2]].mean()
+            next_y = y[end : edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        # Twice the area of the triangles, the constant factor is irrelevant
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+
+        previous = start + int(areas.argmax())
+        indices[i + 1] = previous
+
+    return indices
+
+
+def min_max_indices(x, y=None, n_out=None):
+    """Select the minimum and maximum point of equally sized buckets.
+
+    This keeps the peaks of noisy signals, which makes it well suited for
+    sensor data.
+
+    Args
+    ----
+    x: array_like
+        The x values, or an array of shape (N, 2) if ``y`` is `None`.
+    y: array_like
+        The y values.
+    n_out: int
+        The maximum number of points to keep. Defaults to
+        `max_points_for_width`.
+
+    Returns
+    -------
+    numpy.ndarray
+        The sorted indices of the selected points.
+
+    Examples
+    --------
+    >>> min_max_indices([0, 1, 2, 3, 4, 5], [0, 3, 1, 4, 2, 0], 4).tolist()
+    [0, 2, 3, 5]
+    """
+
+    import numpy as np
+
+    x, y = _as_xy(x, y)
+    n = len(x)
+
+    if n_out is None:
+        n_out = max_points_for_width()
+
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    # Every bucket contributes two points, the first and last point are kept
+    # separately.
+    n_buckets = (n_out - 2) // 2
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype(int)
+    buckets = np.repeat(np.arange(n_buckets), np.diff(edges))
+
+    inner = np.arange(1, n - 1)
+    order = inner[np.lexsort((y[1:-1], buckets))]
+
+    starts = edges[:-1] - 1
+    ends = edges[1:] - 2
+
+    return np.unique(np.concatenate(([0], order[starts], order[ends], [n - 1])))
+
+
+def douglas_peucker_indices(x, y=None, tolerance=None):
+    """Simplify a polyline with the Ramer-Douglas-Peucker algorithm.
+
+    Points that are closer than ``tolerance`` to the simplified line are
+    removed.
+
+    Args
+    ----
+    x: array_like
+        The x values, or an array of shape (N, 2) if ``y`` is `None`.
+    y: array_like
+        The y values.
+    tolerance: float
+        The maximum distance between the original and the simplified line.
+        Defaults to `tolerance_for_width`.
+
+    Returns
+    -------
+    numpy.ndarray
+        The sorted indices of the selected points.
+
+    Examples
+    --------
+    >>> points = [(0, 0), (1, 0.01), (2, 0), (3, 5), (4, 0)]
+    >>> douglas_peucker_indices(points, tolerance=0.1).tolist()
+    [0, 2, 3, 4]
+    """
+
+    import numpy as np
+
+    x, y = _as_xy(x, y)
+    n = len(x)
+
+    if tolerance is None:
+        tolerance = tolerance_for_width()
+
+    if n < 3:
+        return np.arange(n)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        dx = x[end] - x[start]
+        dy = y[end] - y[start]
+        px = x[start + 1 : end] - x[start]
+        py = y[start + 1 : end] - y[start]
+        length = np.hypot(dx, dy)
+
+        if length == 0:
+            distances = np.hypot(px, py)
+        else:
+            distances = np.abs(dx * py - dy * px) / length
+
+        farthest = int(distances.argmax())
+        if distances[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+
+    return np.flatnonzero(keep)
@@ -15,6 +15,29 @@ class CompilerError(PyLaTeXError):
     """A Base class for all PyLaTeX compiler related Exceptions."""
 
 
+class CompilerTimeoutError(CompilerError):
+    """Error for a compilation that took longer than its timeout."""
+
+    def __init__(self, message, output=None, log=None):
+        """
+        Args
+        ----
+        message: str
+            The description of the error.
+        output: bytes
+            The end of the output of the compiler until it was killed.
+        log: `~.TeXLog`
+            The log file that the compiler wrote until it was killed.
+        """
+
+        super().__init__(message)
+        self.output = output
+        self.log = log
+
+    def __reduce__(self):
+        return type(self), (self.args[0], self.output, self.log)
+
+
 class TableError(PyLaTeXError):
     """A Base class for all errors concerning tables."""
 
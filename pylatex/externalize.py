@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+This module implements the compilation of TikZ pictures to separate files.
+
+Every `~.TikZ` picture with ``externalize=True`` is compiled on its own with
+the ``standalone`` document class and the packages of the document. The
+resulting PDF is stored in a cache, named after the hash of the LaTeX source
+of the picture, so it only has to be compiled again when the picture or the
+packages change. The document then
+includes the compiled PDF instead of the picture itself.
+
+..  :license: MIT, see License for more details.
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from ordered_set import OrderedSet
+
+from .errors import CompilerError
+from .package import Package
+from .tikz import TikZ
+from .utils import _replacing, _walk, cache_dir, dumps_list
+
+
+def dumps_standalone(picture, preamble=None, packages=None):
+    """Represent a picture as a full standalone LaTeX document.
+
+    Args
+    ----
+    picture: `~.TikZ`
+        The picture to compile on its own.
+    preamble: list
+        Extra preamble items, for instance color definitions.
+    packages: list
+        Extra packages, for instance those of the document the picture is in.
+
+    Returns
+    -------
+    str
+    """
+
+    picture._propagate_packages()
+
+    # graphicx is always loaded, so the source is the same before and after
+    # it is added to the document for the compiled pictures.
+    all_packages = OrderedSet([Package("graphicx")])
+    all_packages |= packages or []
+    all_packages |= picture.packages
+
+    string = r"\documentclass{standalone}%" + "\n"
+    string += dumps_list(all_packages) + "%\n"
+    if preamble:
+        string += dumps_list(preamble) + "%\n"
+    string += r"\begin{document}%" + "\n"
+    string += picture.dumps_picture() + "%\n"
+    string += r"\end{document}" + "\n"
+
+    return string
+
+
+def _compile_standalone(source, filepath, compiler):
+    """Compile a standalone document and store the PDF at filepath."""
+
+    build_dir = tempfile.mkdtemp(prefix="pylatex-tikz.")
+    jobname = os.path.splitext(os.path.basename(filepath))[0]
+
+    try:
+        with open(os.path.join(build_dir, "picture.tex"), "w", encoding="utf-8") as f:
+            f.write(source)
+
+        command = [
+            compiler,
+            "--interaction=nonstopmode",
+            "--halt-on-error",
+            "--jobname=" + jobname,
+            "picture.tex",
+        ]
+
+        try:
+            subprocess.check_output(command, stderr=subprocess.STDOUT, cwd=build_dir)
+        except (OSError, IOError) as e:
+            if e.errno == errno.ENOENT:
+                raise CompilerError(
+                    "LaTeX compiler {} was not found, so pictures can not be "
+                    "externalized".format(compiler)
+                )
+            raise
+        except subprocess.CalledProcessError as e:
+            print(e.output.decode())
+            raise
+
+        with _replacing(filepath) as tmp_filepath:
+            shutil.move(os.path.join(build_dir, jobname + ".pdf"), tmp_filepath)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def externalize_pictures(
+    container, *, preamble=None, compiler="pdflatex", max_workers=None
+):
+    """Compile all externalized pictures in a container.
+
+    Pictures that are already in the cache are not compiled again. The others
+    are compiled in parallel, with the packages of the container. The
+    ``graphicx`` package, which includes the compiled pictures, is added to
+    the container.
+
+    Args
+    ----
+    container: `~.Container`
+        The container, usually a `~.Document`, to search for pictures with
+        ``externalize=True``.
+    preamble: list
+        Extra preamble items the pictures need, for instance color
+        definitions.
+    compiler: str
+        The LaTeX compiler used for the pictures.
+    max_workers: int
+        The maximum number of pictures that are compiled at the same time. If
+        it is `None` the number of CPUs is used.
+    """
+
+    pictures = [
+        item for item in _walk(container) if isinstance(item, TikZ) and item.externalize
+    ]
+
+    if not pictures:
+        return
+
+    directory = cache_dir("tikz")
+    to_compile = {}
+
+    container._propagate_packages()
+
+    for picture in pictures:
+        source = dumps_standalone(picture, preamble, container.packages)
+        key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        filepath = os.path.join(directory, key + ".pdf")
+
+        picture.externalized_file = filepath
+
+        if not os.path.exists(filepath):
+            to_compile[filepath] = source
+
+    container.packages.add(Package("graphicx"))
+
+    if not to_compile:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = [
+            executor.submit(_compile_standalone, source, filepath, compiler)
+            for filepath, source in to_compile.items()
+        ]
+
+        for future in futures:
+            future.result()
@@ -6,12 +6,359 @@ This module implements the class that deals with graphics.
     :license: MIT, see License for more details.
 """
 
+import hashlib
+import os
+import pickle
 import posixpath
+import re
+import sys
+import threading
 import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
+from . import downsampling
 from .base_classes import Float, UnsafeCommand
 from .package import Package
-from .utils import NoEscape, escape_latex, fix_filename, make_temp_dir
+from .utils import (
+    NoEscape,
+    _replacing,
+    cache_dir,
+    escape_latex,
+    fix_filename,
+    make_temp_dir,
+)
+
+#: The maximum total size in bytes of the files in the plot cache. When it
+#: becomes larger the least recently used plots are removed.
+plot_cache_size = 512 * 1024 * 1024
+
+_render_executor = None
+_image_executor = None
+_pending_renders = []
+_render_lock = threading.Lock()
+
+#: The parameters of Matplotlib that don't change how a figure is saved.
+_ignored_rc_params = ("backend", "backend_fallback", "interactive", "toolbar")
+_ignored_rc_prefixes = ("animation.", "keymap.", "savefig.directory", "webagg.")
+
+
+def _update_fingerprint(digest, value):
+    """Add a value returned by an artist getter to the fingerprint."""
+
+    if hasattr(value, "vertices"):
+        # A Path
+        _update_fingerprint(digest, value.vertices)
+        _update_fingerprint(digest, value.codes)
+    elif hasattr(value, "bounds"):
+        # A Bbox
+        _update_fingerprint(digest, value.bounds)
+    elif hasattr(value, "tobytes") and hasattr(value, "shape"):
+        # A numpy array
+        digest.update(repr((str(value.dtype), value.shape)).encode())
+        digest.update(value.tobytes())
+    elif hasattr(value, "get_matrix"):
+        # A Transform, only its affine part is determined by the figure
+        try:
+            _update_fingerprint(digest, value.get_affine().get_matrix())
+        except Exception:
+            digest.update(type(value).__name__.encode())
+    elif isinstance(value, dict):
+        _update_fingerprint(digest, sorted(value.items()))
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"(")
+        for item in value:
+            _update_fingerprint(digest, item)
+        digest.update(b")")
+    elif value is None or isinstance(value, (bool, int, float, str)):
+        digest.update(repr(value).encode())
+    elif hasattr(value, "name"):
+        # A Colormap
+        digest.update(repr(value.name).encode())
+    else:
+        digest.update(type(value).__name__.encode())
+
+
+def _plot_cache_key(figure, args, kwargs, extension):
+    """Calculate a key that identifies the file a figure is saved as.
+
+    The key is based on the properties of all artists in the figure and on
+    the Matplotlib parameters, not on the identity of the Matplotlib objects,
+    so the same plot gets the same key in a different process. The figure is
+    drawn without rendering first, so the tick labels are known.
+    """
+
+    import matplotlib
+
+    digest = hashlib.sha256()
+    digest.update(repr((extension, args, sorted(kwargs.items()))).encode())
+
+    for name, value in sorted(matplotlib.rcParams.items()):
+        if name in _ignored_rc_params or name.startswith(_ignored_rc_prefixes):
+            continue
+        digest.update(repr((name, value)).encode())
+
+    draw = getattr(figure, "draw_without_rendering", None)
+    if draw is None:
+        # Matplotlib before 3.6 can only draw the figure completely
+        draw = figure.canvas.draw
+    draw()
+
+    for artist in figure.findobj():
+        digest.update(type(artist).__name__.encode())
+        for name, value in sorted(artist.properties().items()):
+            digest.update(name.encode())
+            _update_fingerprint(digest, value)
+
+    return digest.hexdigest()
+
+
+def _evict_plot_cache(directory):
+    """Remove the least recently used plots until the cache is small enough."""
+
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_size = sum(size for _, size, _ in entries)
+
+    for _, size, path in sorted(entries):
+        if total_size <= plot_cache_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+
+#: The metadata keys in which Matplotlib stores the creation date per format.
+_date_metadata = {
+    "pdf": "CreationDate",
+    "ps": "CreationDate",
+    "eps": "CreationDate",
+    "svg": "Date",
+}
+
+
+def _savefig(figure, filepath, args, kwargs):
+    """Save a figure, the file only appears once it is complete."""
+
+    kwargs = dict(kwargs)
+    kwargs.setdefault("format", os.path.splitext(filepath)[1][1:])
+
+    # Leave out the creation date, so the same plot gives the same file and
+    # documents that include it can be found in the build cache.
+    date_key = _date_metadata.get(kwargs["format"])
+    if date_key is not None:
+        kwargs.setdefault("metadata", {date_key: None})
+
+    with _replacing(filepath) as tmp_filepath:
+        figure.savefig(tmp_filepath, *args, **kwargs)
+
+
+def _render_pickled_plot(pickled_figure, filepath, args, kwargs):
+    """Save a pickled Matplotlib figure, this runs in a worker process."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    figure = pickle.loads(pickled_figure)
+    _savefig(figure, filepath, args, kwargs)
+    plt.close(figure)
+
+
+def _submit_render(function, *args, threads=False):
+    """Run a function in the background rendering pool.
+
+    Plots are rendered in a process pool, because Matplotlib holds the GIL.
+    Images are processed in a thread pool, because Pillow releases it.
+    """
+    global _render_executor, _image_executor
+
+    with _render_lock:
+        if threads:
+            if _image_executor is None:
+                _image_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+            executor = _image_executor
+        else:
+            if _render_executor is None:
+                _render_executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+            executor = _render_executor
+
+        _pending_renders.append(executor.submit(function, *args))
+
+
+def wait_for_plots():
+    """Wait until all plots and images that are saved in the background are done.
+
+    This is called automatically before a `~.Document` is generated.
+    """
+
+    with _render_lock:
+        pending = list(_pending_renders)
+        del _pending_renders[:]
+
+    for future in pending:
+        future.result()
+
+
+def _reset_render_pools():
+    """Forget the pools of the parent process in a forked child process.
+
+    The threads that manage the pools are not copied into the child, so it
+    has to start its own pools.
+    """
+    global _render_executor, _image_executor, _render_lock
+
+    _render_executor = None
+    _image_executor = None
+    _render_lock = threading.Lock()
+    del _pending_renders[:]
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_render_pools)
+
+
+_length_regex = re.compile(
+    r"^\s*([0-9]*\.?[0-9]*)\s*"
+    r"(\\textwidth|\\linewidth|\\columnwidth|in|cm|mm|pt|bp)\s*$"
+)
+
+_inches_per_unit = {
+    "in": 1,
+    "cm": 1 / 2.54,
+    "mm": 1 / 25.4,
+    "pt": 1 / 72.27,
+    "bp": 1 / 72,
+}
+
+
+def _width_in_inches(width):
+    """Estimate the printed width of a LaTeX length in inches.
+
+    Lengths relative to the text width assume a text width of
+    `~.DEFAULT_TARGET_WIDTH`. If the length can not be parsed the text width
+    is returned.
+    """
+
+    match = _length_regex.match(str(width)) if width is not None else None
+
+    if match is None:
+        return downsampling.DEFAULT_TARGET_WIDTH
+
+    factor = float(match.group(1)) if match.group(1) not in ("", ".") else 1
+    unit = match.group(2)
+
+    if unit.startswith("\\"):
+        return factor * downsampling.DEFAULT_TARGET_WIDTH
+
+    return factor * _inches_per_unit[unit]
+
+
+#: The image modes that can be saved as PNG.
+_png_modes = ("1", "L", "LA", "P", "RGB", "RGBA", "I", "I;16", "I;16B")
+
+
+def _process_image(source, target, max_width, quality):
+    """Downsample, recompress and strip the metadata of an image."""
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image.load()
+        image_format = image.format
+
+        if image.width > max_width:
+            height = max(1, round(image.height * max_width / image.width))
+            image = image.resize((max_width, height), Image.LANCZOS)
+
+        # Only the pixels and the color profile are kept, all other metadata
+        # (like EXIF data and comments) is left out.
+        save_kwargs = {}
+        if image.info.get("icc_profile"):
+            save_kwargs["icc_profile"] = image.info["icc_profile"]
+
+        with _replacing(target) as tmp_target:
+            if image_format == "JPEG":
+                image.save(
+                    tmp_target, "JPEG", quality=quality, optimize=True, **save_kwargs
+                )
+            else:
+                if image.mode not in _png_modes:
+                    # PNG can't store pixels like CMYK or LAB. The color
+                    # profile belongs to the original mode, so it is dropped.
+                    alpha = "A" in image.getbands()
+                    image = image.convert("RGBA" if alpha else "RGB")
+                    save_kwargs.pop("icc_profile", None)
+                image.save(tmp_target, "PNG", optimize=True, **save_kwargs)
+
+
+def process_image(filename, width=None, *, dpi=None, quality=85, background=True):
+    r"""Prepare a raster image for printing at a certain width.
+
+    Images that have more pixels than can be printed at ``width`` with
+    ``dpi`` are downsampled. The result is recompressed, without any metadata
+    except for the color profile, and stored in a persistent cache named
+    after a hash of the image and the settings. JPEG images stay JPEG images,
+    other images are stored as PNG. This requires Pillow.
+
+    Args
+    ----
+    filename: str
+        Filename of the image.
+    width: str
+        The width the image is printed at as a LaTeX length, for instance
+        ``r'0.8\textwidth'`` or ``'5cm'``.
+    dpi: int
+        The resolution of the output. Defaults to `~.DEFAULT_DPI`.
+    quality: int
+        The quality used for JPEG images.
+    background: bool
+        Process the image in a thread pool. The image is guaranteed to be
+        processed before the document is generated, or after
+        `wait_for_plots` has been called.
+
+    Returns
+    -------
+    str
+        The filename of the processed image. Images that are not in a raster
+        format Pillow knows, like PDF files, are returned unchanged.
+    """
+
+    if dpi is None:
+        dpi = downsampling.DEFAULT_DPI
+
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".gif"):
+        return filename
+
+    max_width = max(1, int(_width_in_inches(width) * dpi))
+
+    digest = hashlib.sha256()
+    digest.update(repr((max_width, quality)).encode())
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+    if extension not in (".jpg", ".jpeg"):
+        extension = ".png"
+
+    target = posixpath.join(cache_dir("images"), digest.hexdigest() + extension)
+
+    if os.path.exists(target):
+        # Mark the image as recently used
+        os.utime(target)
+    elif background:
+        _submit_render(
+            _process_image, filename, target, max_width, quality, threads=True
+        )
+    else:
+        _process_image(filename, target, max_width, quality)
+
+    return target
 
 
 class Figure(Float):
@@ -22,7 +369,9 @@ class Figure(Float):
         filename,
         *,
         width=NoEscape(r"0.8\textwidth"),
-        placement=NoEscape(r"\centering")
+        placement=NoEscape(r"\centering"),
+        process=False,
+        dpi=None
     ):
         """Add an image to the figure.
 
@@ -34,9 +383,18 @@ class Figure(Float):
             The width of the image
         placement: str
             Placement of the figure, `None` is also accepted.
+        process: bool
+            Downsample the image to the resolution that is needed to print it
+            at ``width``, recompress it and strip its metadata. See
+            `process_image`.
+        dpi: int
+            The resolution that is used when processing the image.
 
         """
 
+        if process:
+            filename = process_image(filename, width, dpi=dpi)
+
         if width is not None:
             if self.escape:
                 width = escape_latex(width)
@@ -50,7 +408,15 @@ class Figure(Float):
             StandAloneGraphic(image_options=width, filename=fix_filename(filename))
         )
 
-    def _save_plot(self, *args, extension="pdf", **kwargs):
+    def _save_plot(
+        self,
+        *args,
+        figure=None,
+        extension="pdf",
+        background=False,
+        cache=False,
+        **kwargs
+    ):
         """Save the plot.
 
         Returns
@@ -58,29 +424,78 @@ class Figure(Float):
         str
             The basename with which the plot has been saved.
         """
-        import matplotlib.pyplot as plt
 
-        tmp_path = make_temp_dir()
-        filename = "{}.{}".format(str(uuid.uuid4()), extension.strip("."))
-        filepath = posixpath.join(tmp_path, filename)
-
-        plt.savefig(filepath, *args, **kwargs)
+        if figure is None:
+            import matplotlib.pyplot as plt
+
+            figure = plt.gcf()
+
+        extension = extension.strip(".")
+
+        if cache:
+            directory = cache_dir("plots")
+            key = _plot_cache_key(figure, args, kwargs, extension)
+            filepath = posixpath.join(directory, "{}.{}".format(key, extension))
+
+            if os.path.exists(filepath):
+                # Mark the plot as recently used
+                os.utime(filepath)
+                return filepath
+
+            _evict_plot_cache(directory)
+        else:
+            filename = "{}.{}".format(str(uuid.uuid4()), extension)
+            filepath = posixpath.join(make_temp_dir(), filename)
+
+        if background:
+            try:
+                pickled_figure = pickle.dumps(figure)
+            except Exception:
+                # Not every figure can be pickled, those are saved directly.
+                pass
+            else:
+                _submit_render(
+                    _render_pickled_plot, pickled_figure, filepath, args, kwargs
+                )
+                return filepath
+
+        _savefig(figure, filepath, args, kwargs)
         return filepath
 
-    def add_plot(self, *args, extension="pdf", **kwargs):
-        """Add the current Matplotlib plot to the figure.
+    def add_figure(
+        self,
+        figure,
+        *args,
+        extension="pdf",
+        close=False,
+        background=False,
+        cache=False,
+        **kwargs
+    ):
+        """Add a Matplotlib figure to the figure.
 
-        The plot that gets added is the one that would normally be shown when
-        using ``plt.show()``.
+        The figure is saved with the non-interactive backend that belongs to
+        the file type, so no pyplot state is used. This makes it possible to
+        create figures with ``matplotlib.figure.Figure`` directly, which are
+        freed as soon as they are not referenced anymore.
 
         Args
         ----
+        figure: matplotlib.figure.Figure
+            The Matplotlib figure to add.
         args:
-            Arguments passed to plt.savefig for displaying the plot.
+            Arguments passed to savefig for displaying the figure.
         extension : str
             extension of image file indicating figure file type
+        close: bool
+            Close the figure in pyplot after it has been saved, so pyplot does
+            not keep it in memory.
+        background: bool
+            Save the figure in a separate process, see `add_plot`.
+        cache: bool
+            Store the figure in a persistent cache, see `add_plot`.
         kwargs:
-            Keyword arguments passed to plt.savefig for displaying the plot. In
+            Keyword arguments passed to savefig for displaying the figure. In
             case these contain ``width`` or ``placement``, they will be used
             for the same purpose as in the add_image command. Namely the width
             and placement of the generated plot in the LaTeX document.
@@ -92,10 +507,74 @@ class Figure(Float):
             if key in kwargs:
                 add_image_kwargs[key] = kwargs.pop(key)
 
-        filename = self._save_plot(*args, extension=extension, **kwargs)
+        filename = self._save_plot(
+            *args,
+            figure=figure,
+            extension=extension,
+            background=background,
+            cache=cache,
+            **kwargs
+        )
+
+        if close:
+            pyplot = sys.modules.get("matplotlib.pyplot")
+            if pyplot is not None:
+                pyplot.close(figure)
 
         self.add_image(filename, **add_image_kwargs)
 
+    def add_plot(
+        self,
+        *args,
+        extension="pdf",
+        close=False,
+        background=False,
+        cache=False,
+        **kwargs
+    ):
+        """Add the current Matplotlib plot to the figure.
+
+        The plot that gets added is the one that would normally be shown when
+        using ``plt.show()``.
+
+        Args
+        ----
+        args:
+            Arguments passed to plt.savefig for displaying the plot.
+        extension : str
+            extension of image file indicating figure file type
+        close: bool
+            Close the plot after it has been saved. Pyplot keeps all plots in
+            memory until they are closed.
+        background: bool
+            Save the plot in a separate process, so the document can be built
+            further in the meantime. The plot is guaranteed to be saved
+            before the document is generated, or after `wait_for_plots` has
+            been called.
+        cache: bool
+            Store the plot in a persistent cache, named after a hash of the
+            properties of all artists in the figure, the Matplotlib
+            parameters and the arguments. The same plot is then only saved
+            once, also across runs. The size of the cache is limited by
+            `plot_cache_size`.
+        kwargs:
+            Keyword arguments passed to plt.savefig for displaying the plot. In
+            case these contain ``width`` or ``placement``, they will be used
+            for the same purpose as in the add_image command. Namely the width
+            and placement of the generated plot in the LaTeX document.
+        """
+        import matplotlib.pyplot as plt
+
+        self.add_figure(
+            plt.gcf(),
+            *args,
+            extension=extension,
+            close=close,
+            background=background,
+            cache=cache,
+            **kwargs
+        )
+
 
 class SubFigure(Figure):
     """A class that represents a subfigure from the subcaption package."""
@@ -122,7 +601,15 @@ class SubFigure(Figure):
 
         super().__init__(arguments=width, **kwargs)
 
-    def add_image(self, filename, *, width=NoEscape(r"\linewidth"), placement=None):
+    def add_image(
+        self,
+        filename,
+        *,
+        width=NoEscape(r"\linewidth"),
+        placement=None,
+        process=False,
+        dpi=None
+    ):
         """Add an image to the subfigure.
 
         Args
@@ -133,9 +620,15 @@ class SubFigure(Figure):
             Width of the image in LaTeX terms.
         placement: str
             Placement of the figure, `None` is also accepted.
+        process: bool
+            Prepare the image for printing, see `Figure.add_image`.
+        dpi: int
+            The resolution that is used when processing the image.
         """
 
-        super().add_image(filename, width=width, placement=placement)
+        super().add_image(
+            filename, width=width, placement=placement, process=process, dpi=dpi
+        )
 
 
 class StandAloneGraphic(UnsafeCommand):
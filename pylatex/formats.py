@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+This module implements precompiled preambles, stored as TeX format files.
+
+Loading the packages of a preamble often takes most of the time of compiling
+a short document. The ``mylatexformat`` package dumps the state of TeX at the
+end of a preamble into a format file. Documents with the same preamble can
+then be compiled with that format, which skips loading the packages again.
+
+Format files only work with the TeX engine and version that built them, so
+both are part of their name.
+
+..  :license: MIT, see License for more details.
+"""
+
+import errno
+import functools
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+
+from .errors import CompilerError
+from .utils import _replacing, cache_dir
+
+
+@functools.lru_cache(maxsize=None)
+def _engine_version(engine):
+    """Get the version line of a TeX engine, it is only looked up once."""
+
+    try:
+        output = subprocess.check_output(
+            [engine, "--version"], stderr=subprocess.STDOUT
+        )
+    except (OSError, IOError) as e:
+        if e.errno == errno.ENOENT:
+            raise CompilerError(
+                "LaTeX compiler {} was not found, so no format can be "
+                "built".format(engine)
+            )
+        raise
+
+    return output.decode(errors="replace").partition("\n")[0]
+
+
+def format_dir():
+    """Get the directory in which the format files are stored.
+
+    Returns
+    -------
+    str
+    """
+
+    return cache_dir("formats")
+
+
+def build_format(preamble, engine="pdflatex"):
+    r"""Get a format with a precompiled preamble, it is built if needed.
+
+    Args
+    ----
+    preamble: str
+        Everything in a document before ``\begin{document}``.
+    engine: str
+        The TeX engine that will use the format, for instance ``pdflatex``
+        or ``xelatex``.
+
+    Returns
+    -------
+    str
+        The name of the format, which can be passed to the ``-fmt`` option
+        of the engine. The file is stored in `format_dir`.
+    """
+
+    key = hashlib.sha256()
+    key.update(engine.encode("utf-8") + b"\0")
+    key.update(_engine_version(engine).encode("utf-8") + b"\0")
+    key.update(preamble.encode("utf-8"))
+    name = "pylatex-" + key.hexdigest()
+
+    directory = format_dir()
+    filepath = os.path.join(directory, name + ".fmt")
+
+    if os.path.exists(filepath):
+        return name
+
+    build_dir = tempfile.mkdtemp(prefix="pylatex-format.")
+
+    try:
+        with open(os.path.join(build_dir, "preamble.tex"), "w", encoding="utf-8") as f:
+            f.write(preamble)
+            f.write("\\begin{document}\n\\end{document}\n")
+
+        command = [
+            engine,
+            "-ini",
+            "-interaction=nonstopmode",
+            "-jobname=" + name,
+            "&" + engine,
+            "mylatexformat.ltx",
+            "preamble.tex",
+        ]
+
+        try:
+            subprocess.check_output(command, stderr=subprocess.STDOUT, cwd=build_dir)
+        except subprocess.CalledProcessError as e:
+            print(e.output.decode())
+            raise
+
+        with _replacing(filepath) as tmp_filepath:
+            shutil.move(os.path.join(build_dir, name + ".fmt"), tmp_filepath)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    return name
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+This module implements a parser for the log files of TeX compilers.
+
+The log is turned into errors, warnings and bad boxes, together with the file
+and line they belong to. It also tells whether the document has to be
+compiled again, for instance because references changed.
+
+..  :license: MIT, see License for more details.
+"""
+
+import re
+
+#: TeX wraps the lines in its log at this length.
+_max_print_line = 79
+
+_file_line_error_regex = re.compile(
+    r"^(?P<file>[^:\s][^:]*):(?P<line>\d+): (?P<msg>.*)"
+)
+_input_line_regex = re.compile(r"^l\.(?P<line>\d+)")
+_warning_regex = re.compile(
+    r"^(?:(?:Package|Class) (?P<package>\S+)|LaTeX(?: \w+)?) " r"Warning: (?P<msg>.*)"
+)
+_warning_line_regex = re.compile(r"on input line (?P<line>\d+)")
+_bad_box_regex = re.compile(
+    r"^(?:Overfull|Underfull) \\[hv]box \([^)]*\) "
+    r"(?:in paragraph at lines (?P<first>\d+)--\d+|in alignment at lines "
+    r"(?P<alignment>\d+)--\d+|detected at line (?P<detected>\d+)|.*)"
+)
+_file_regex = re.compile(r"\((?P<file>[^\s()]*)|\)")
+_rerun_regex = re.compile(r"\b[Rr]erun\b")
+_missing_file_regex = re.compile(r"^No file (?P<file>\S+)\.$")
+#: The lists that LaTeX writes in one pass to typeset them in the next one.
+_listing_extensions = (".toc", ".lof", ".lot")
+#: The files that LaTeX writes in one pass to read them in the next one.
+_pass_extensions = (".aux",) + _listing_extensions
+_memory_regex = re.compile(
+    r"^\s*(?P<used>\S+) (?P<name>.+?) out of (?P<available>\S+)$"
+)
+_page_regex = re.compile(r"\[(\d+)(?=[\]\s{<]|$)")
+
+
+class LogEntry:
+    """A single error, warning or bad box in a log."""
+
+    def __init__(self, level, message, file=None, line=None, package=None):
+        """
+        Args
+        ----
+        level: str
+            One of ``"error"``, ``"warning"`` or ``"badbox"``.
+        message: str
+            The message, with its lines joined.
+        file: str
+            The file that was being read, if it is known.
+        line: int
+            The line in that file, if it is known.
+        package: str
+            The package or class that gave the warning.
+        """
+
+        self.level = level
+        self.message = message
+        self.file = file
+        self.line = line
+        self.package = package
+
+    def __repr__(self):
+        location = ""
+        if self.file is not None:
+            location = " {}:{}".format(self.file, self.line)
+        return "<LogEntry {}{} {!r}>".format(self.level, location, self.message)
+
+    def __str__(self):
+        location = ""
+        if self.file is not None:
+            location = "{}:{}: ".format(
+                self.file, "" if self.line is None else self.line
+            )
+        return location + self.message
+
+
+class TeXLog:
+    """The parsed log of a compiler run."""
+
+    def __init__(self, entries, memory_usage=None, missing_files=None):
+        """
+        Args
+        ----
+        entries: list
+            The `LogEntry` objects in the order they appear in the log.
+        memory_usage: dict
+            The statistics TeX writes at the end of the log.
+        missing_files: list
+            The files LaTeX reported with ``No file``.
+        """
+
+        #: All entries in the order they appear in the log.
+        self.entries = entries
+        #: How much of its memory TeX used, by the name TeX gives it, as a
+        #: tuple of the used and the available amount. The amounts are
+        #: integers, or strings for values with several parts.
+        self.memory_usage = memory_usage or {}
+        #: The files that LaTeX looked for but did not find, like the table
+        #: of contents in the first pass.
+        self.missing_files = missing_files or []
+
+    @property
+    def errors(self):
+        """list: The errors."""
+
+        return [entry for entry in self.entries if entry.level == "error"]
+
+    @property
+    def warnings(self):
+        """list: The warnings, without bad boxes."""
+
+        return [entry for entry in self.entries if entry.level == "warning"]
+
+    @property
+    def bad_boxes(self):
+        """list: The overfull and underfull boxes."""
+
+        return [entry for entry in self.entries if entry.level == "badbox"]
+
+    @property
+    def rerun_needed(self):
+        """bool: Whether compiling again would change the document.
+
+        This is the case when a warning asks for a rerun, or when a list that
+        LaTeX writes for the next pass, like the table of contents, was
+        missing. A missing aux file alone is no reason, LaTeX warns when the
+        labels in it changed.
+        """
+
+        return any(
+            path.endswith(_listing_extensions) for path in self.missing_files
+        ) or any(_rerun_regex.search(entry.message) for entry in self.warnings)
+
+    @classmethod
+    def from_file(cls, filepath):
+        """Parse a log file.
+
+        Args
+        ----
+        filepath: str
+            The path of the ``.log`` file.
+
+        Returns
+        -------
+        TeXLog
+        """
+
+        with open(filepath, encoding="utf-8", errors="replace") as f:
+            return parse_log(f.read())
+
+
+def _unwrap(text):
+    """Join the lines that TeX wrapped because they were too long."""
+
+    lines = []
+    wrapped = False
+
+    for line in text.splitlines():
+        if wrapped:
+            lines[-1] += line
+        else:
+            lines.append(line)
+        wrapped = len(line) == _max_print_line
+
+    return lines
+
+
+def _track_files(line, stack):
+    """Update the stack of open files with the parentheses in a line."""
+
+    for match in _file_regex.finditer(line):
+        if match.group(0) == ")":
+            if stack:
+                stack.pop()
+        else:
+            path = match.group("file")
+            looks_like_file = path.startswith(("/", "./", "../")) or (
+                "." in path and not path.replace(".", "").isdigit()
+            )
+            stack.append(path if looks_like_file else None)
+
+
+def _current_file(stack):
+    for path in reversed(stack):
+        if path is not None:
+            return path
+    return None
+
+
+def parse_log(text):
+    r"""Parse the log of a TeX compiler.
+
+    Args
+    ----
+    text: str
+        The content of the ``.log`` file.
+
+    Returns
+    -------
+    TeXLog
+
+    Examples
+    --------
+    >>> log = parse_log(
+    >>>     "(./doc.tex\n"
+    >>>     "LaTeX Warning: Reference `fig' on page 1 undefined on input line 5.\n"
+    >>>     "\n"
+    >>>     "Overfull \\hbox (3.0pt too wide) in paragraph at lines 7--8\n"
+    >>>     "! Undefined control sequence.\n"
+    >>>     "l.9 \\foo\n"
+    >>>     ")"
+    >>> )
+    >>> for entry in log.entries:
+    >>>     print(entry)
+    ./doc.tex:5: Reference `fig' on page 1 undefined on input line 5.
+    ./doc.tex:7: Overfull \hbox (3.0pt too wide) in paragraph at lines 7--8
+    ./doc.tex:9: Undefined control sequence.
+    >>> log.rerun_needed
+    False
+    """
+
+    lines = _unwrap(text)
+    entries = []
+    memory_usage = {}
+    missing_files = []
+    stack = []
+    i = 0
+
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+
+        if line == "Here is how much of TeX's memory you used:":
+            while i < len(lines):
+                match = _memory_regex.match(lines[i])
+                if not match:
+                    break
+                memory_usage[match.group("name")] = (
+                    _amount(match.group("used")),
+                    _amount(match.group("available")),
+                )
+                i += 1
+            continue
+
+        match = _missing_file_regex.match(line)
+        if match:
+            missing_files.append(match.group("file"))
+            continue
+
+        if line.startswith("! "):
+            entry = LogEntry("error", line[2:], _current_file(stack))
+            # The line number follows in the context of the error
+            for context in lines[i : i + 10]:
+                match = _input_line_regex.match(context)
+                if match:
+                    entry.line = int(match.group("line"))
+                    break
+            entries.append(entry)
+            continue
+
+        match = _file_line_error_regex.match(line)
+        if match:
+            entries.append(
+                LogEntry(
+                    "error",
+                    match.group("msg"),
+                    match.group("file"),
+                    int(match.group("line")),
+                )
+            )
+            continue
+
+        match = _warning_regex.match(line)
+        if match:
+            package = match.group("package")
+            message = match.group("msg")
+
+            # Warnings continue on lines that are indented, or that start
+            # with the name of the package in parentheses.
+            while i < len(lines) and lines[i].strip():
+                continuation = lines[i]
+                if package and continuation.startswith("(" + package + ")"):
+                    continuation = continuation[len(package) + 2 :]
+                elif not continuation.startswith(" "):
+                    break
+                message += " " + continuation.strip()
+                i += 1
+
+            entry = LogEntry("warning", message, _current_file(stack), None, package)
+            match = _warning_line_regex.search(message)
+            if match:
+                entry.line = int(match.group("line"))
+            entries.append(entry)
+            continue
+
+        match = _bad_box_regex.match(line)
+        if match:
+            line_number = (
+                match.group("first")
+                or match.group("alignment")
+                or match.group("detected")
+            )
+            entries.append(
+                LogEntry(
+                    "badbox",
+                    line,
+                    _current_file(stack),
+                    int(line_number) if line_number else None,
+                )
+            )
+            continue
+
+        _track_files(line, stack)
+
+    return TeXLog(entries, memory_usage, missing_files)
+
+
+def _amount(value):
+    return int(value) if value.isdigit() else value
+
+
+def _shipped_pages(text):
+    """Get the page numbers TeX writes to its output when it ships pages out.
+
+    >>> _shipped_pages("(./doc.aux) [1{/usr/share/pdftex.map}] [2] [3 <./a.png>]")
+    [1, 2, 3]
+    """
+
+    return [int(page) for page in _page_regex.findall(text)]
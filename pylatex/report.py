@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+This module implements the report of where the time of a build goes.
+
+Pass ``report=True`` to `~.Document.generate_pdf` to get a `CompileReport`.
+Besides the time of every compiler pass, it tells how long every package
+and class took to load in the first pass. TeX flushes its output each time
+it opens a file, so the file names it prints are timestamped when they
+arrive. The load time of a package is the time between opening its file and
+reading the output after it was closed, so it includes the packages it
+loads itself.
+
+..  :license: MIT, see License for more details.
+"""
+
+import os
+
+from .log import TeXLog, _file_regex, _max_print_line
+
+
+class CompileReport:
+    """The timings and statistics of building a PDF."""
+
+    def __init__(self):
+        #: The seconds it took to render the document and prepare the build.
+        self.render_time = None
+        #: The wall time in seconds of every compiler process that ran.
+        self.pass_times = []
+        #: The seconds from the start of `~.Document.generate_pdf` until the
+        #: PDF was in place.
+        self.total_time = None
+        #: Whether the PDF was taken from the build cache.
+        self.cache_hit = False
+        #: The size of the PDF in bytes.
+        self.pdf_size = None
+        #: The memory statistics at the end of the log of the last pass, see
+        #: `~.TeXLog.memory_usage`.
+        self.memory_usage = {}
+        #: The seconds it took to load every package and class in the first
+        #: pass, by file name, in the order in which they were loaded.
+        self.package_times = {}
+
+        self._files = []
+        self._pending = ""
+
+    def __repr__(self):
+        return "<CompileReport passes={} total_time={!r} pdf_size={!r}>".format(
+            len(self.pass_times), self.total_time, self.pdf_size
+        )
+
+    def _feed_output(self, text, now):
+        """Time the files that are opened and closed in a line of output."""
+
+        if len(self.pass_times) > 0:
+            # Only the first pass loads packages without cached aux files
+            return
+
+        # TeX wraps long lines, which could split a file name
+        line = self._pending + text.rstrip("\r\n")
+        if len(text.rstrip("\r\n")) == _max_print_line:
+            self._pending = line
+            return
+        self._pending = ""
+
+        for match in _file_regex.finditer(line):
+            if match.group(0) == ")":
+                if self._files:
+                    name, start = self._files.pop()
+                    if name is not None:
+                        self.package_times[name] = now - start
+            else:
+                name = os.path.basename(match.group("file"))
+                if not name.endswith((".sty", ".cls")) or name in self.package_times:
+                    name = None
+                else:
+                    # Keep the order in which the files are opened
+                    self.package_times[name] = None
+                self._files.append((name, now))
+
+    def _add_pass(self, seconds):
+        self._files = []
+        self._pending = ""
+        self.pass_times.append(seconds)
+
+    def _read_results(self, log_file, pdf_file):
+        """Collect the statistics of the files a build produced."""
+
+        self.package_times = {
+            name: seconds
+            for name, seconds in self.package_times.items()
+            if seconds is not None
+        }
+
+        try:
+            self.memory_usage = TeXLog.from_file(log_file).memory_usage
+        except (OSError, IOError):
+            pass
+
+        self.pdf_size = os.path.getsize(pdf_file)
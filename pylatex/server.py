@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+This module implements a local service that compiles documents.
+
+The server limits how many documents are compiled at the same time on the
+machine and lets all clients share the build and format caches. Start it
+with::
+
+    python -m pylatex.server --socket /tmp/pylatex.sock
+
+A client sends the rendered document together with the images it includes,
+and gets the PDF back. Use it through ``Document.generate_pdf(remote=...)``,
+where the address is the path of a Unix socket or a ``(host, port)`` tuple.
+
+Messages are a JSON header, prefixed by its length, followed by the binary
+files that the header lists.
+
+..  :license: MIT, see License for more details.
+"""
+
+import argparse
+import json
+import os
+import posixpath
+import shutil
+import socket
+import socketserver
+import struct
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from .compilers import registered_compilers
+from .document import Document, _tmpfs_dir
+from .errors import CompilerError
+from .utils import _workspace_paths
+
+_length_format = "!I"
+
+#: The options of `~.Document.generate_pdf` that clients can send.
+_options = ("compiler", "compiler_args", "build_cache", "preamble_format")
+
+
+def _send(stream, header, blobs=()):
+    """Write a message to a binary file object."""
+
+    header = dict(header, blobs=[len(blob) for blob in blobs])
+    data = json.dumps(header).encode("utf-8")
+
+    stream.write(struct.pack(_length_format, len(data)) + data)
+    for blob in blobs:
+        stream.write(blob)
+    stream.flush()
+
+
+def _read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ConnectionError("The connection was closed in a message")
+    return data
+
+
+def _receive(stream):
+    """Read a message from a binary file object.
+
+    Returns
+    -------
+    tuple
+        The header and the list of binary files.
+    """
+
+    (size,) = struct.unpack(
+        _length_format, _read_exactly(stream, struct.calcsize(_length_format))
+    )
+    header = json.loads(_read_exactly(stream, size).decode("utf-8"))
+    blobs = [_read_exactly(stream, blob_size) for blob_size in header["blobs"]]
+
+    return header, blobs
+
+
+def _connect(address):
+    if isinstance(address, (tuple, list)):
+        return socket.create_connection(tuple(address))
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+class _RenderedDocument(Document):
+    """A document of which only the LaTeX source is known."""
+
+    def __init__(self, source, preamble, input_files, absolute_files, workspaces):
+        super().__init__()
+
+        self.source = source
+        self.preamble_source = preamble
+        self.input_files = input_files
+        self.absolute_files = absolute_files
+        self.workspaces = workspaces
+
+    def dumps(self):
+        return self.source
+
+    def iter_dumps(self):
+        yield self.source
+
+    def dumps_preamble(self):
+        return self.preamble_source
+
+    def _prepare_dumps(self):
+        pass
+
+    def _input_files(self, directory):
+        paths = [os.path.join(directory, path) for path in self.input_files]
+        return paths + self.absolute_files
+
+    def _cache_workspaces(self):
+        # Plots of the client are in its own workspaces, which have random
+        # names, so they are keyed by their content as well.
+        paths = set(super()._cache_workspaces()) | set(self.workspaces)
+        return sorted(paths, key=len, reverse=True)
+
+
+def compile_remote(
+    document,
+    address,
+    *,
+    directory=None,
+    compiler=None,
+    compiler_args=None,
+    build_cache=False,
+    preamble_format=False
+):
+    """Compile a document with a server and return the PDF.
+
+    The images with a relative path are sent along. Files with an absolute
+    path, like plots and cached pictures, are read by the server directly,
+    because it runs on the same machine. Their paths are sent, so the server
+    can add their content to the key in its build cache. The paths of the
+    temporary workspaces are sent as well, so files in them are keyed by
+    their content only.
+
+    Args
+    ----
+    document: `~.Document`
+        The document to compile.
+    address: `str` or `tuple`
+        The path of the Unix socket, or the host and port of the server.
+    directory: str
+        The directory relative image paths are relative to, by default the
+        current directory.
+    compiler: `str` or `None`
+        The name of the LaTeX compiler to use, see `~.Document.generate_pdf`.
+        The server only accepts the compilers it allows, see `CompileServer`.
+    compiler_args: `list` or `None`
+        Extra arguments that should be passed to the LaTeX compiler. The
+        server rejects them, this only exists for the same signature as
+        `~.Document.generate_pdf`.
+    build_cache: bool
+        Whether the server uses its build cache.
+    preamble_format: bool
+        Whether the server uses a precompiled preamble.
+
+    Returns
+    -------
+    bytes
+    """
+
+    if directory is None:
+        directory = os.getcwd()
+
+    document._prepare_dumps()
+
+    assets = document._relative_images()
+    absolute_files = sorted(
+        {path for path in document._input_files("") if os.path.isabs(path)}
+    )
+    blobs = []
+    for path in assets:
+        with open(os.path.join(directory, path), "rb") as f:
+            blobs.append(f.read())
+
+    header = {
+        "source": document.dumps(),
+        "preamble": document.dumps_preamble() if preamble_format else None,
+        "assets": assets,
+        "files": absolute_files,
+        "workspaces": _workspace_paths(),
+        "options": {
+            "compiler": compiler,
+            "compiler_args": compiler_args,
+            "build_cache": build_cache,
+            "preamble_format": preamble_format,
+        },
+    }
+
+    with _connect(address) as sock, sock.makefile("rwb") as stream:
+        _send(stream, header, blobs)
+        response, blobs = _receive(stream)
+
+    error = response.get("error")
+    if error == "CalledProcessError":
+        raise subprocess.CalledProcessError(
+            response["returncode"], response["command"], blobs[0]
+        )
+    elif error is not None:
+        raise CompilerError(response["message"])
+
+    return blobs[0]
+
+
+def _check_options(options, compilers):
+    """Check the options a client sent, before anything is compiled.
+
+    Args
+    ----
+    options: dict
+        The options for `~.Document.generate_pdf`.
+    compilers: `list` or `None`
+        The compilers clients may use, `None` for the registered ones.
+
+    Returns
+    -------
+    dict
+        The keyword arguments for `~.Document.generate_pdf`.
+    """
+
+    if not isinstance(options, dict):
+        raise ValueError("The options have to be an object")
+
+    unknown = sorted(set(options) - set(_options))
+    if unknown:
+        raise ValueError("Unknown options: {}".format(", ".join(unknown)))
+
+    if compilers is None:
+        compilers = [name for name, _ in registered_compilers()]
+    compiler = options.get("compiler")
+    if compiler is not None and compiler not in compilers:
+        raise ValueError("The compiler {} is not allowed".format(compiler))
+
+    if options.get("compiler_args"):
+        raise ValueError("Compiler arguments are not allowed")
+
+    return {
+        "compiler": compiler,
+        "build_cache": bool(options.get("build_cache")),
+        "preamble_format": bool(options.get("preamble_format")),
+    }
+
+
+def _compile_job(header, blobs, compilers=None):
+    """Compile a document that was sent to the server."""
+
+    options = _check_options(header["options"], compilers)
+
+    absolute_files = header.get("files", [])
+    workspaces = header.get("workspaces", [])
+    if not all(
+        isinstance(path, str) and os.path.isabs(path)
+        for path in absolute_files + workspaces
+    ):
+        raise ValueError("The included files need absolute paths")
+
+    directory = tempfile.mkdtemp(prefix="pylatex-server.", dir=_tmpfs_dir())
+
+    try:
+        for path, blob in zip(header["assets"], blobs):
+            normalized = posixpath.normpath(path)
+            if (
+                posixpath.isabs(normalized)
+                or normalized.startswith("../")
+                or normalized == ".."
+            ):
+                raise CompilerError(
+                    "Included file {} is outside the document directory".format(path)
+                )
+
+            filepath = os.path.join(directory, normalized)
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            with open(filepath, "wb") as f:
+                f.write(blob)
+
+        document = _RenderedDocument(
+            header["source"],
+            header["preamble"],
+            header["assets"],
+            absolute_files,
+            workspaces,
+        )
+        filepath = os.path.join(directory, "document")
+        document.generate_pdf(filepath, **options)
+
+        with open(filepath + ".pdf", "rb") as f:
+            return f.read()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            header, blobs = _receive(self.rfile)
+        except (ConnectionError, ValueError, KeyError):
+            return
+
+        future = self.server.executor.submit(
+            _compile_job, header, blobs, self.server.compilers
+        )
+
+        try:
+            pdf = future.result()
+        except subprocess.CalledProcessError as e:
+            response = {
+                "error": "CalledProcessError",
+                "returncode": e.returncode,
+                "command": e.cmd,
+            }
+            blobs = [e.output or b""]
+        except Exception as e:
+            response = {
+                "error": type(e).__name__,
+                "message": "{}: {}".format(type(e).__name__, e),
+            }
+            blobs = []
+        else:
+            response = {"error": None}
+            blobs = [pdf]
+
+        _send(self.wfile, response, blobs)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class CompileServer:
+    """A server that compiles the documents that clients send to it."""
+
+    def __init__(self, address, *, max_workers=None, compilers=None):
+        """
+        Args
+        ----
+        address: `str` or `tuple`
+            The path of the Unix socket to listen on, or a host and port. Use
+            ``("127.0.0.1", port)`` to only accept local connections.
+        max_workers: int
+            The maximum number of documents that are compiled at the same
+            time. If it is `None` the number of CPUs is used.
+        compilers: list
+            The names or paths of the compilers that clients may ask for. If
+            it is `None` only the compilers in the `~.compilers` registry are
+            allowed. Clients can never pass arguments to a compiler.
+        """
+
+        if isinstance(address, (tuple, list)):
+            self._server = _TCPServer(tuple(address), _Handler)
+        else:
+            if os.path.exists(address):
+                # Remove the socket of a server that was not shut down
+                os.remove(address)
+            self._server = _UnixServer(address, _Handler)
+
+        self._server.executor = ThreadPoolExecutor(
+            max_workers=max_workers or os.cpu_count()
+        )
+        self._server.compilers = None if compilers is None else list(compilers)
+
+    @property
+    def address(self):
+        """The address the server listens on."""
+
+        return self._server.server_address
+
+    def serve_forever(self):
+        """Handle requests until `shutdown` is called."""
+
+        self._server.serve_forever()
+
+    def shutdown(self):
+        """Stop serving, this has to be called from another thread."""
+
+        self._server.shutdown()
+
+    def close(self):
+        """Close the socket and wait for the running jobs."""
+
+        self._server.server_close()
+        self._server.executor.shutdown()
+
+        if isinstance(self.address, str):
+            try:
+                os.remove(self.address)
+            except FileNotFoundError:
+                pass
+
+
+def main(argv=None):
+    """Run the server from the command line."""
+
+    parser = argparse.ArgumentParser(
+        prog="python -m pylatex.server", description="Compile PyLaTeX documents."
+    )
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--socket", help="the path of the Unix socket")
+    group.add_argument("--port", type=int, help="the TCP port to listen on")
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="the host to listen on with --port"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="the number of documents compiled at once"
+    )
+    parser.add_argument(
+        "--compiler",
+        action="append",
+        dest="compilers",
+        help="a compiler clients may use, by default the registered ones",
+    )
+    args = parser.parse_args(argv)
+
+    address = args.socket if args.socket else (args.host, args.port)
+    server = CompileServer(address, max_workers=args.workers, compilers=args.compilers)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,23 @@ This module implements the classes used to show plots.
     :license: MIT, see License for more details.
 """
 
+import hashlib
 import math
+import os
+import posixpath
 import re
 
+from . import downsampling
 from .base_classes import Command, Container, Environment, LatexObject, Options
+from .figure import StandAloneGraphic
 from .package import Package
+from .utils import (
+    NoEscape,
+    _latex_item_to_string,
+    _write_atomic,
+    fix_filename,
+    make_temp_dir,
+)
 
 
 class TikZOptions(Options):
@@ -24,12 +36,192 @@ class TikZOptions(Options):
         self._positional_args.append(option)
 
 
-class TikZ(Environment):
+_loop_number_regex = re.compile(r"(?<![0-9.\\])-?[0-9]+(?:\.[0-9]+)?(?![\w.])")
+
+
+def _loop_variable(index):
+    """Get the name of a ``\\foreach`` variable, like ``\\pylatexloopa``."""
+
+    letters = ""
+    while True:
+        index, remainder = divmod(index, 26)
+        letters += "abcdefghijklmnopqrstuvwxyz"[remainder]
+        if index == 0:
+            return "\\pylatexloop" + letters
+        index -= 1
+
+
+def compress_loops(strings, *, min_run=3):
+    r"""Collapse runs of similar TikZ commands into ``\foreach`` loops.
+
+    Consecutive single line commands that are the same except for some of
+    their numbers are replaced by one ``\foreach`` loop over those numbers.
+
+    Args
+    ----
+    strings: list
+        The LaTeX strings of the commands.
+    min_run: int
+        The minimum number of similar commands that is replaced by a loop.
+
+    Returns
+    -------
+    list
+        The LaTeX strings, with the loops.
+
+    Examples
+    --------
+    >>> print(compress_loops([
+    >>>     r"\node at (0,1) {};",
+    >>>     r"\node at (1,1) {};",
+    >>>     r"\node at (2,1) {};",
+    >>> ])[0])
+    \foreach \pylatexloopa in {0,1,2}{\node at (\pylatexloopa,1) {};}
+    """
+
+    parsed = []
+    for string in strings:
+        template = values = None
+        if string.startswith("\\") and string.endswith(";") and "\n" not in string:
+            values = _loop_number_regex.findall(string)
+            if values:
+                template = tuple(_loop_number_regex.split(string))
+        parsed.append((template, values))
+
+    compressed = []
+    i = 0
+    while i < len(strings):
+        template = parsed[i][0]
+        if template is None:
+            compressed.append(strings[i])
+            i += 1
+            continue
+
+        end = i + 1
+        while end < len(strings) and parsed[end][0] == template:
+            end += 1
+
+        rows = [values for _, values in parsed[i:end]]
+        varying = [j for j, column in enumerate(zip(*rows)) if len(set(column)) > 1]
+
+        if end - i < min_run or not varying:
+            compressed.extend(strings[i:end])
+            i = end
+            continue
+
+        variables = {j: _loop_variable(n) for n, j in enumerate(varying)}
+        body = template[0]
+        for j, part in enumerate(template[1:]):
+            body += variables.get(j, rows[0][j]) + part
+
+        items = ",".join("/".join(row[j] for j in varying) for row in rows)
+        compressed.append(
+            "\\foreach {} in {{{}}}{{{}}}".format(
+                "/".join(variables.values()), items, body
+            )
+        )
+        i = end
+
+    return compressed
+
+
+class _TikZEnvironment(Environment):
+    """Base class for the environments that contain TikZ commands."""
+
+    #: Collapse runs of commands that only differ in their numbers into
+    #: ``\foreach`` loops, which makes dense pictures faster to parse. See
+    #: `compress_loops`.
+    compress_loops = False
+
+    def __init__(self, *, compress_loops=None, **kwargs):
+        """
+        Args
+        ----
+        compress_loops: bool
+            Collapse similar commands into loops. If it is `None` the class
+            default is used.
+        """
+
+        if compress_loops is not None:
+            self.compress_loops = compress_loops
+
+        super().__init__(**kwargs)
+
+    def dumps_content(self, **kwargs):
+        r"""Represent the content as a string in LaTeX syntax.
+
+        Args
+        ----
+        \*\*kwargs:
+            Arguments that can be passed to `~.dumps_list`
+
+        Returns
+        -------
+        str
+        """
+
+        if not self.compress_loops:
+            return super().dumps_content(**kwargs)
+
+        strings = [
+            _latex_item_to_string(item, escape=self.escape, as_content=True)
+            for item in self
+        ]
+
+        return NoEscape(self.content_separator.join(compress_loops(strings)))
+
+
+class TikZ(_TikZEnvironment):
     """Basic TikZ container class."""
 
     _latex_name = "tikzpicture"
     packages = [Package("tikz")]
 
+    def __init__(self, *, externalize=False, **kwargs):
+        """
+        Args
+        ----
+        externalize: bool
+            Compile the picture separately and include the resulting PDF in
+            the document. The compiled picture is cached, so it is only
+            compiled again when it changes. See `~.externalize_pictures`.
+        """
+
+        self.externalize = externalize
+
+        #: The compiled picture, this is set by `~.externalize_pictures`.
+        self.externalized_file = None
+
+        super().__init__(**kwargs)
+
+    def dumps(self):
+        """Represent the picture as a string in LaTeX syntax.
+
+        If the picture has been externalized this includes the compiled
+        picture instead.
+
+        Returns
+        -------
+        str
+        """
+
+        if self.externalize and self.externalized_file is not None:
+            return StandAloneGraphic(
+                fix_filename(self.externalized_file), image_options=None
+            ).dumps()
+
+        return self.dumps_picture()
+
+    def dumps_picture(self):
+        """Represent the picture itself as a string in LaTeX syntax.
+
+        Returns
+        -------
+        str
+        """
+
+        return super().dumps()
+
 
 class Axis(Environment):
     """PGFPlots axis container class, this contains plots."""
@@ -47,7 +239,7 @@ class Axis(Environment):
         super().__init__(options=options, data=data)
 
 
-class TikZScope(Environment):
+class TikZScope(_TikZEnvironment):
     """TikZ Scope Environment."""
 
     _latex_name = "scope"
@@ -316,11 +508,119 @@ class TikZPathList(LatexObject):
         self._last_item_type = None
         self._arg_list = []
 
+        # An (N, 2) array of points, which are connected by _connector. This
+        # is only used for paths created with from_points.
+        self._points = None
+        self._connector = None
+
         # parse list and verify legality
         self._parse_arg_list(args)
 
+    @classmethod
+    def from_points(cls, points, connector="--"):
+        """Build a path list that connects a large number of points.
+
+        The points are stored in a single array instead of as separate
+        `TikZCoordinate` objects, which makes it fast to create, transform and
+        dump paths with many points. This requires numpy.
+
+        Args
+        ----
+        points: array_like
+            The coordinates of the points, with shape (N, 2).
+        connector: str or `TikZUserPath`
+            The path type that is used between every two points.
+
+        Returns
+        -------
+        TikZPathList
+
+        Examples
+        --------
+        >>> TikZPathList.from_points([(0, 0), (1, 2), (2, 0)]).dumps()
+        '(0.0,0.0) -- (1.0,2.0) -- (2.0,0.0)'
+        """
+
+        import numpy as np
+
+        path_list = cls()
+        path_list._connector = path_list._add_path(connector, parse_only=True)
+        path_list._points = np.array(points, dtype=float).reshape(-1, 2)
+
+        if len(path_list._points):
+            path_list._last_item_type = "point"
+
+        return path_list
+
+    def _materialize_points(self):
+        """Convert the array of points to normal path elements."""
+
+        if self._points is None:
+            return
+
+        for i, (x, y) in enumerate(self._points.tolist()):
+            if i > 0:
+                self._arg_list.append(self._connector)
+            self._arg_list.append(TikZCoordinate(x, y))
+
+        self._points = None
+        self._connector = None
+
+    def translate(self, x, y):
+        """Move all absolute coordinates of the path.
+
+        Args
+        ----
+        x: float
+            The distance to move in the x direction.
+        y: float
+            The distance to move in the y direction.
+        """
+
+        if self._points is not None:
+            self._points += (x, y)
+            return
+
+        self._arg_list = [
+            (
+                item + (x, y)
+                if isinstance(item, TikZCoordinate) and not item.relative
+                else item
+            )
+            for item in self._arg_list
+        ]
+
+    def scale(self, x, y=None):
+        """Scale all coordinates of the path relative to the origin.
+
+        Args
+        ----
+        x: float
+            The scale factor in the x direction.
+        y: float
+            The scale factor in the y direction, if it is `None` the x factor
+            is used.
+        """
+
+        if y is None:
+            y = x
+
+        if self._points is not None:
+            self._points *= (x, y)
+            return
+
+        self._arg_list = [
+            (
+                TikZCoordinate(item._x * x, item._y * y, relative=item.relative)
+                if isinstance(item, TikZCoordinate)
+                else item
+            )
+            for item in self._arg_list
+        ]
+
     def append(self, item):
         """Add a new element to the current path."""
+        self._materialize_points()
         self._parse_next_item(item)
 
     def _parse_next_item(self, item):
@@ -420,9 +720,81 @@ class TikZPathList(LatexObject):
         else:
             return _item
 
+    def simplify(self, tolerance=None):
+        """Remove points of straight lines that would not be visible.
+
+        Every run of absolute coordinates that are connected by ``--`` is
+        simplified with the Douglas-Peucker algorithm, see
+        `~.douglas_peucker_indices`. This requires numpy.
+
+        Args
+        ----
+        tolerance: float
+            The maximum distance between the original and the simplified
+            line. If it is `None` details smaller than a printed dot are
+            removed, see `~.tolerance_for_width`.
+        """
+
+        def is_point(item):
+            return isinstance(item, TikZCoordinate) and not item.relative
+
+        def is_line(item):
+            return (
+                isinstance(item, TikZUserPath)
+                and item.path_type == "--"
+                and item.options is None
+            )
+
+        if self._points is not None:
+            if is_line(self._connector):
+                indices = downsampling.douglas_peucker_indices(
+                    self._points, tolerance=tolerance
+                )
+                self._points = self._points[indices]
+            return
+
+        items = self._arg_list
+        simplified = []
+        i = 0
+
+        while i < len(items):
+            if not is_point(items[i]):
+                simplified.append(items[i])
+                i += 1
+                continue
+
+            run = [items[i]]
+            while (
+                i + 2 < len(items) and is_line(items[i + 1]) and is_point(items[i + 2])
+            ):
+                run.append(items[i + 2])
+                i += 2
+            i += 1
+
+            if len(run) > 2:
+                indices = downsampling.douglas_peucker_indices(
+                    [(point._x, point._y) for point in run], tolerance=tolerance
+                )
+                run = [run[index] for index in indices.tolist()]
+
+            for j, point in enumerate(run):
+                if j > 0:
+                    simplified.append(TikZUserPath("--"))
+                simplified.append(point)
+
+        self._arg_list = simplified
+
     def dumps(self):
         """Return representation of the path command."""
 
+        if self._points is not None:
+            if not len(self._points):
+                return ""
+
+            separator = " " + self._connector.dumps() + " "
+            template = separator.join(["({},{})"] * len(self._points))
+            return template.format(*self._points.ravel().tolist())
+
         ret_str = []
         for item in self._arg_list:
             if isinstance(item, TikZUserPath):
@@ -463,6 +835,13 @@ class TikZPath(TikZObject):
         """Append a path element to the current list."""
         self.path.append(element)
 
+    def simplify(self, tolerance=None):
+        """Remove points of straight lines that would not be visible.
+
+        See `TikZPathList.simplify`.
+        """
+        self.path.simplify(tolerance)
+
     def dumps(self):
         """Return a representation for the command."""
 
@@ -500,7 +879,16 @@ class Plot(LatexObject):
     packages = [Package("pgfplots"), Command("pgfplotsset", "compat=newest")]
 
     def __init__(
-        self, name=None, func=None, coordinates=None, error_bar=None, options=None
+        self,
+        name=None,
+        func=None,
+        coordinates=None,
+        error_bar=None,
+        options=None,
+        *,
+        data_file=False,
+        downsample=None,
+        max_points=None
     ):
         """
         Args
@@ -513,16 +901,105 @@ class Plot(LatexObject):
             A list of exact coordinates tat should be plotted.
 
         options: str, list or `~.Options`
+        data_file: bool
+            Write the coordinates to an external ``.dat`` file in the
+            temporary directory and read them with ``\\addplot table``
+            instead of placing them inline. This is a lot faster for pgfplots
+            to parse when there are many coordinates.
+        downsample: str
+            Reduce the number of coordinates before they are written, either
+            with ``'lttb'`` (Largest-Triangle-Three-Buckets) or with
+            ``'minmax'`` (the extremes of every bucket). This requires numpy.
+        max_points: int
+            The maximum number of coordinates to keep when downsampling. If
+            it is `None` this is based on the width of the printed page, see
+            `~.max_points_for_width`.
         """
 
+        if downsample not in (None, "lttb", "minmax"):
+            raise ValueError('Unknown downsample method: "{}"'.format(downsample))
+
         self.name = name
         self.func = func
         self.coordinates = coordinates
         self.error_bar = error_bar
         self.options = options
+        self.data_file = data_file
+        self.downsample = downsample
+        self.max_points = max_points
 
         super().__init__()
 
+    def _selected_data(self):
+        """Get the coordinates and error bars after downsampling.
+
+        Returns
+        -------
+        tuple
+        """
+
+        coordinates = self.coordinates
+        error_bar = self.error_bar
+
+        if self.downsample is None:
+            return coordinates, error_bar
+
+        if self.downsample == "lttb":
+            indices = downsampling.lttb_indices(coordinates, n_out=self.max_points)
+        else:
+            indices = downsampling.min_max_indices(coordinates, n_out=self.max_points)
+
+        if len(indices) == len(coordinates):
+            return coordinates, error_bar
+
+        coordinates = [coordinates[i] for i in indices.tolist()]
+        if error_bar is not None:
+            error_bar = [error_bar[i] for i in indices.tolist()]
+
+        return coordinates, error_bar
+
+    def _dumps_table(self):
+        """Represent the coordinates as a space separated data table.
+
+        Returns
+        -------
+        bytes
+        """
+
+        coordinates, error_bar = self._selected_data()
+
+        if error_bar is None:
+            rows = ("{} {}".format(x, y) for x, y in coordinates)
+        else:
+            rows = (
+                "{} {} {} {}".format(x, y, e_x, e_y)
+                for (x, y), (e_x, e_y) in zip(coordinates, error_bar)
+            )
+
+        # Always use \n, so the file is the same on every platform
+        return ("\n".join(rows) + "\n").encode("ascii")
+
+    def _write_data_file(self):
+        """Write the coordinates to a data file in the temporary directory.
+
+        The name of the file is the hash of its content, so plots with the
+        same data share a single file.
+
+        Returns
+        -------
+        str
+            The path of the data file.
+        """
+
+        table = self._dumps_table()
+        filename = hashlib.sha1(table).hexdigest() + ".dat"
+        filepath = posixpath.join(make_temp_dir(), filename)
+
+        if not os.path.exists(filepath):
+            _write_atomic(filepath, table)
+
+        return filepath
+
     def dumps(self):
         """Represent the plot as a string in LaTeX syntax.
 
@@ -533,16 +1010,25 @@ class Plot(LatexObject):
 
         string = Command("addplot", options=self.options).dumps()
 
-        if self.coordinates is not None:
+        if self.coordinates is not None and self.data_file:
+            string += " table"
+
+            if self.error_bar is not None:
+                string += "[x error index=2,y error index=3]"
+
+            string += " {" + fix_filename(self._write_data_file()) + "};%\n%\n"
+
+        elif self.coordinates is not None:
+            coordinates, error_bar = self._selected_data()
             string += " coordinates {%\n"
 
-            if self.error_bar is None:
-                for x, y in self.coordinates:
+            if error_bar is None:
+                for x, y in coordinates:
                     # ie: "(x,y)"
                     string += "(" + str(x) + "," + str(y) + ")%\n"
 
             else:
-                for (x, y), (e_x, e_y) in zip(self.coordinates, self.error_bar):
+                for (x, y), (e_x, e_y) in zip(coordinates, error_bar):
                     # ie: "(x,y) +- (e_x,e_y)"
                     string += (
                         "("
@@ -6,9 +6,15 @@ This module implements some simple utility functions.
     :license: MIT, see License for more details.
 """
 
+import os
 import os.path
 import shutil
 import tempfile
+import threading
+import uuid
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
 
 import pylatex.base_classes
 
@@ -30,13 +36,41 @@ _latex_special_chars = {
     "]": r"{]}",
 }
 
-_tmp_path = None
-
 
 def _is_iterable(element):
     return hasattr(element, "__iter__") and not isinstance(element, str)
 
 
+def _walk(item):
+    """Iterate over an item and everything it contains, depth first.
+
+    This goes into the content of containers and into the arguments and
+    options of commands. Items that are not a `~.LatexObject`, such as
+    strings, are yielded as well.
+
+    Args
+    ----
+    item: object
+        The item to start from.
+    """
+
+    yield item
+
+    if isinstance(item, pylatex.base_classes.Container):
+        children = item.data
+    elif isinstance(item, pylatex.base_classes.CommandBase):
+        children = [item.arguments, item.options]
+        if item.extra_arguments is not None:
+            children.append(item.extra_arguments)
+    elif isinstance(item, pylatex.base_classes.command.Parameters):
+        children = item._positional_args + list(item._key_value_args.values())
+    else:
+        return
+
+    for child in children:
+        yield from _walk(child)
+
+
 class NoEscape(str):
     """
     A simple string class that is not escaped.
@@ -328,9 +362,159 @@ def verbatim(s, *, delimiter="|"):
     return NoEscape(r"\verb" + delimiter + s + delimiter)
 
 
+class TempWorkspace:
+    """A temporary directory that is shared by everything that uses it.
+
+    The directory is created the first time it is needed. Users of the
+    workspace, like a `~.Document`, acquire a reference to it and release it
+    when they are done. The directory is removed once the last reference is
+    released, so documents that are built at the same time never remove each
+    other's files.
+
+    Files like saved plots are stored in the workspace that is active in the
+    current context (see `use`), or in a process wide default workspace.
+
+    Examples
+    --------
+    >>> workspace = TempWorkspace()
+    >>> with workspace.use():
+    >>>     doc = pylatex.Document(workspace=workspace)
+    >>>     assert make_temp_dir() == workspace.path
+    """
+
+    def __init__(self, prefix="pylatex-tmp."):
+        """
+        Args
+        ----
+        prefix: str
+            The prefix of the name of the temporary directory.
+        """
+
+        self.prefix = prefix
+        self._path = None
+        self._references = 0
+        self._owner = False
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks can't be pickled and references only count in this process
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_references"] = 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        # The directory is removed by the workspace that created it
+        self._owner = False
+        if self._path is not None:
+            _workspaces.add(self)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # Copies of documents share their workspace
+        return self
+
+    @property
+    def path(self):
+        """The absolute filepath to the directory, it is created if needed."""
+
+        with self._lock:
+            if self._path is None:
+                self._path = tempfile.mkdtemp(prefix=self.prefix)
+                self._owner = True
+                _workspaces.add(self)
+            return self._path
+
+    def acquire(self):
+        """Add a reference to the workspace.
+
+        Returns
+        -------
+        TempWorkspace
+            The workspace itself.
+        """
+
+        with self._lock:
+            self._references += 1
+        return self
+
+    def release(self):
+        """Remove a reference, the last one removes the directory."""
+
+        with self._lock:
+            self._references = max(self._references - 1, 0)
+            if self._references == 0:
+                self._remove()
+
+    def cleanup(self):
+        """Remove the directory, even if it is still referenced."""
+
+        with self._lock:
+            self._remove()
+
+    def _remove(self):
+        if self._path is not None:
+            if self._owner:
+                shutil.rmtree(self._path, ignore_errors=True)
+            self._path = None
+
+    @contextmanager
+    def use(self):
+        """Use the workspace for temporary files in a specific context.
+
+        The context is local to the current thread or asyncio task. The
+        workspace is referenced while the context is active.
+        """
+
+        self.acquire()
+        token = _active_workspace.set(self)
+        try:
+            yield self
+        finally:
+            _active_workspace.reset(token)
+            self.release()
+
+
+_workspaces = weakref.WeakSet()
+_default_workspace = TempWorkspace()
+_active_workspace = ContextVar("pylatex_workspace", default=None)
+
+
+def current_workspace():
+    """Get the workspace that is used for temporary files.
+
+    Returns
+    -------
+    TempWorkspace
+        The workspace activated with `TempWorkspace.use`, or the process wide
+        default workspace.
+    """
+
+    workspace = _active_workspace.get()
+    if workspace is None:
+        return _default_workspace
+    return workspace
+
+
+def _workspace_paths():
+    """Get the directories of all workspaces that exist at the moment.
+
+    Nested directories come before the directories that contain them.
+    """
+
+    paths = (workspace._path for workspace in list(_workspaces))
+    return sorted((path for path in paths if path is not None), key=len, reverse=True)
+
+
 def make_temp_dir():
     """Create a temporary directory if it doesn't exist.
 
+    The directory belongs to the current workspace, see `current_workspace`.
+
     Returns
     -------
     str
@@ -342,16 +526,109 @@ def make_temp_dir():
     '/tmp/pylatex-tmp.y_b7xp21'
     """
 
-    global _tmp_path
-    if not _tmp_path:
-        _tmp_path = tempfile.mkdtemp(prefix="pylatex-tmp.")
-    return _tmp_path
+    return current_workspace().path
 
 
 def rm_temp_dir():
-    """Remove the temporary directory specified in ``_tmp_path``."""
+    """Remove the temporary directory of the current workspace.
+
+    This removes the directory even if other documents still use it, use
+    `TempWorkspace.release` to remove it only when it is no longer used.
+    """
+
+    current_workspace().cleanup()
+
+
+def cache_dir(name):
+    """Get a persistent directory in which PyLaTeX can cache files.
+
+    The base directory can be set with the ``PYLATEX_CACHE_DIR`` environment
+    variable, otherwise the ``pylatex`` directory in the user cache directory
+    is used.
+
+    Args
+    ----
+    name: str
+        The name of the subdirectory for a specific kind of cached files.
+
+    Returns
+    -------
+    str
+        The absolute filepath to the created directory.
+    """
+
+    base = os.environ.get("PYLATEX_CACHE_DIR")
+    if not base:
+        base = os.path.join(
+            os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+            "pylatex",
+        )
+
+    path = os.path.abspath(os.path.join(base, name))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _unfix_filename(path):
+    """Get the original path of a filename changed by `fix_filename`."""
+
+    if path.startswith(r"\detokenize{") and path.endswith("}"):
+        path = path[len(r"\detokenize{") : -1]
+
+    head, _, filename = path.rpartition("/")
+    if filename.startswith("{") and "}." in filename:
+        filename = filename[1:].replace("}.", ".", 1)
+
+    return head + "/" + filename if head or path.startswith("/") else filename
+
+
+@contextmanager
+def _replacing(filepath):
+    """Get a temporary path that replaces a file when the block ends.
+
+    The file is placed as a whole, so no partially written file is ever
+    visible. The temporary name is unique, so threads and processes that
+    write the same file at the same time don't collide. If the block raises,
+    the temporary file is removed.
+
+    Args
+    ----
+    filepath: str
+        The file to replace.
+    """
+
+    tmp_filepath = "{}.{}.tmp".format(filepath, uuid.uuid4().hex)
+
+    try:
+        yield tmp_filepath
+        os.replace(tmp_filepath, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp_filepath)
+        except OSError:
+            pass
+        raise
+
+
+def _link_or_copy(source, target, *, link=True):
+    """Place a file at target by hard linking it, or copying it if that fails.
+
+    With ``link=False`` the file is always copied, which is needed when the
+    source is written to again later.
+    """
+
+    with _replacing(target) as tmp_target:
+        try:
+            if not link:
+                raise OSError
+            os.link(source, tmp_target)
+        except OSError:
+            shutil.copyfile(source, tmp_target)
+
+
+def _write_atomic(filepath, data):
+    """Write bytes to a file, so no partially written file is ever visible."""
 
-    global _tmp_path
-    if _tmp_path:
-        shutil.rmtree(_tmp_path)
-        _tmp_path = None
+    with _replacing(filepath) as tmp_filepath:
+        with open(tmp_filepath, "wb") as f:
+            f.write(data)
@@ -31,6 +31,7 @@ extras = {
     "docs": ["sphinx", "jinja2<3.0", "MarkupSafe==2.0.1", "alabaster<0.7.12"],
     "matrices": ["numpy"],
     "matplotlib": ["matplotlib"],
+    "images": ["pillow"],
     "quantities": ["quantities", "numpy"],
     "testing": ["pytest>=4.6", "coverage", "pytest-cov", "black", "isort", "xdoctest"],
     "packaging": ["twine"],
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+import os
+import stat
+
+import pytest
+
+# Every fake compiler starts by reading its arguments: tex is the last one,
+# out the output directory, job the job name and fmt the format.
+_arguments_script = (
+    "#!/bin/sh\n"
+    "out=.\n"
+    "for arg; do\n"
+    '  case "$arg" in\n'
+    '    --output-directory=*) out="${arg#*=}";;\n'
+    '    -jobname=*|--jobname=*) job="${arg#*=}";;\n'
+    '    -fmt=*) fmt="${arg#*=}";;\n'
+    "  esac\n"
+    '  tex="$arg"\n'
+    "done\n"
+    'if [ -z "$job" ]; then job="${tex##*/}"; job="${job%.tex}"; fi\n'
+)
+
+
+@pytest.fixture
+def fake_compiler(tmp_path):
+    """Get a function that creates a compiler from a shell script.
+
+    The function takes the script, and optionally the name of the executable
+    and its directory, which is ``tmp_path`` by default. It returns the path
+    of the executable.
+    """
+
+    def create(script, name="fakelatex", directory=tmp_path):
+        path = os.path.join(str(directory), name)
+        with open(path, "w") as f:
+            f.write(_arguments_script + script)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        return path
+
+    return create
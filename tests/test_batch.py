@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+import os
+import time
+
+import pytest
+
+from pylatex import Document
+from pylatex.batch import Job, compile_documents
+from pylatex.errors import CompilerTimeoutError
+
+# Logs the jobs the compiler runs
+_logging = 'echo "$job" >> "$(dirname "$tex")/jobs"\n'
+
+
+def _document(directory, name):
+    doc = Document(os.path.join(str(directory), name))
+    doc.append(name)
+    return doc
+
+
+def test_compile_documents(tmp_path, fake_compiler):
+    compiler = fake_compiler(_logging + 'cp "$tex" "${tex%.tex}.pdf"\n')
+
+    jobs = [
+        Job(_document(tmp_path, "low"), compiler=compiler),
+        Job(_document(tmp_path, "high"), priority=10, compiler=compiler),
+        Job(lambda: _document(tmp_path, "factory"), compiler=compiler),
+    ]
+    results = compile_documents(jobs, max_workers=1)
+
+    assert [result.job for result in results] == jobs
+    assert all(result.succeeded for result in results)
+    assert all(result.attempts == 1 for result in results)
+    assert all(result.compile_time >= 0 for result in results)
+    assert (tmp_path / "jobs").read_text().split() == ["high", "low", "factory"]
+    assert (tmp_path / "factory.pdf").exists()
+
+
+def test_compile_documents_failures(tmp_path, fake_compiler):
+    compiler = fake_compiler(
+        _logging + 'case "$job" in slow) sleep 10;; broken) exit 1;; esac\n'
+        'cp "$tex" "${tex%.tex}.pdf"\n',
+    )
+
+    results = compile_documents(
+        [
+            Job(_document(tmp_path, "slow"), timeout=0.5, compiler=compiler),
+            Job(_document(tmp_path, "broken"), compiler=compiler),
+            Job(_document(tmp_path, "good"), compiler=compiler),
+        ],
+        retries=2,
+    )
+    slow, broken, good = results
+
+    # Timeouts are retried, errors in the document are not
+    assert isinstance(slow.error, CompilerTimeoutError)
+    assert slow.attempts == 3
+    assert broken.attempts == 1
+    assert not broken.succeeded
+    assert "CalledProcessError" in broken.traceback
+    assert good.succeeded
+
+
+def test_compile_documents_timeout_kills_compiler(tmp_path, fake_compiler):
+    compiler = fake_compiler('echo $$ > "$(dirname "$tex")/pid"\nsleep 37\n')
+
+    (result,) = compile_documents(
+        [Job(_document(tmp_path, "slow"), timeout=0.5, compiler=compiler)],
+        retries=0,
+    )
+    assert isinstance(result.error, CompilerTimeoutError)
+
+    pid = int((tmp_path / "pid").read_text())
+    for _ in range(50):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail("The compiler is still running")
+
+
+def test_compile_documents_not_posix(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "name", "nt")
+
+    with pytest.raises(ValueError):
+        compile_documents([Job(_document(tmp_path, "doc"), memory_limit=10**9)])
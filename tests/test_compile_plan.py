@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+from pylatex import (
+    Command,
+    Document,
+    Label,
+    Marker,
+    NoEscape,
+    Package,
+    Pageref,
+    PageStyle,
+    Section,
+    simple_page_number,
+)
+from pylatex.analysis import compile_plan
+from pylatex.headfoot import Foot
+
+
+def test_single_pass():
+    doc = Document()
+    doc.append("Some text")
+    doc.append(Label(Marker("unused")))
+
+    plan = compile_plan(doc)
+    assert plan.features == {"labels"}
+    assert not plan.multi_pass
+    assert plan.passes == 1
+
+
+def test_multi_pass():
+    doc = Document()
+    with doc.create(Section("Results")):
+        doc.append(Pageref(Marker("results", "sec")))
+    assert compile_plan(doc).features == {"labels", "references"}
+
+    doc = Document()
+    doc.append(NoEscape(r"See section~\ref{sec:results}"))
+    assert compile_plan(doc).multi_pass
+
+    doc = Document()
+    doc.append(Command("tableofcontents"))
+    assert compile_plan(doc).features == {"table of contents"}
+
+    doc = Document()
+    page_style = PageStyle("footer")
+    with page_style.create(Foot("C")):
+        page_style.append(simple_page_number())
+    doc.preamble.append(page_style)
+    assert compile_plan(doc).features == {"last page"}
+
+    doc = Document()
+    doc.packages.append(Package("hyperref"))
+    doc.append(Section("Outline", label=False))
+    assert compile_plan(doc).features == {"outlines"}
+
+
+def test_generate_pdf_single_pass(tmp_path, fake_compiler):
+    # The log always asks for a rerun, like lastpage does on a first run
+    path = fake_compiler(
+        'echo run >> "$(dirname "$0")/runs"\n'
+        'echo "LaTeX Warning: Label(s) may have changed. Rerun." > plan.log\n'
+        "touch plan.pdf\n"
+    )
+
+    doc = Document(str(tmp_path / "plan"))
+    doc.append("Some text")
+    doc.generate_pdf(compiler=path, plan_passes=True)
+    assert (tmp_path / "runs").read_text().count("run") == 1
+
+    doc.append(Pageref(Marker("LastPage")))
+    doc.generate_pdf(compiler=path, plan_passes=True)
+    assert (tmp_path / "runs").read_text().count("run") > 2
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+
+from pylatex import Document
+from pylatex.log import parse_log
+
+_log = """\
+(./doc.tex
+LaTeX2e <2020-10-01>
+)
+Here is how much of TeX's memory you used:
+ 3422 strings out of 478287
+ 49367 string characters out of 5849283
+ 33i,4n,38p,229b,214s stack positions out of 5000i,500n,10000p,200000b,80000s
+
+Output written on doc.pdf (1 page, 12345 bytes).
+"""
+
+
+def test_memory_usage():
+    log = parse_log(_log)
+    assert log.memory_usage == {
+        "strings": (3422, 478287),
+        "string characters": (49367, 5849283),
+        "stack positions": (
+            "33i,4n,38p,229b,214s",
+            "5000i,500n,10000p,200000b,80000s",
+        ),
+    }
+
+
+def test_report(tmp_path, fake_compiler):
+    with open(str(tmp_path / "expected.log"), "w") as f:
+        f.write(_log)
+
+    path = fake_compiler(
+        'echo "(./doc.tex (/tex/article.cls"\n'
+        "sleep 0.2\n"
+        'echo ") (/tex/geometry.sty (/tex/keyval.sty)"\n'
+        "sleep 0.1\n"
+        'echo ") (./doc.aux) [1] )"\n'
+        "cp expected.log doc.log\n"
+        "printf '%1000s' > doc.pdf\n"
+    )
+
+    doc = Document(str(tmp_path / "doc"))
+    assert doc.generate_pdf(compiler=path) is None
+    report = doc.generate_pdf(compiler=path, report=True)
+
+    assert len(report.pass_times) == 1
+    assert report.pass_times[0] >= 0.3
+    assert report.total_time >= report.pass_times[0]
+    assert report.pdf_size == 1000
+    assert report.memory_usage["strings"] == (3422, 478287)
+    assert list(report.package_times) == ["article.cls", "geometry.sty", "keyval.sty"]
+    assert report.package_times["article.cls"] >= 0.2
+    assert report.package_times["geometry.sty"] >= 0.1
+    assert report.package_times["keyval.sty"] < 0.1
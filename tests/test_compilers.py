@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+import os
+
+from pylatex import Document
+from pylatex.compilers import (
+    available_compilers,
+    clear_cache,
+    find_compiler,
+    register_compiler,
+    registered_compilers,
+    unregister_compiler,
+)
+
+
+def test_registry():
+    names = [name for name, _ in registered_compilers()]
+    assert names[:2] == ["latexmk", "pdflatex"]
+
+    register_compiler("xelatex", index=0)
+    try:
+        assert registered_compilers()[0] == ("xelatex", [])
+    finally:
+        unregister_compiler("xelatex")
+    assert "xelatex" not in [name for name, _ in registered_compilers()]
+
+
+def test_generate_pdf_with_found_compiler(tmp_path, monkeypatch, fake_compiler):
+    # Only pdflatex is installed, it records an extra output file
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    path = fake_compiler(
+        'echo "$1" > args\n'
+        ": > doc.aux\n"
+        ": > doc.toc\n"
+        ": > doc.pdf\n"
+        'printf "PWD %s\\nINPUT doc.tex\\nOUTPUT doc.toc\\n'
+        'OUTPUT doc.pdf\\nOUTPUT /elsewhere.aux\\n" "$PWD" > doc.fls\n',
+        name="pdflatex",
+        directory=bin_dir,
+    )
+
+    monkeypatch.setenv("PATH", str(bin_dir))
+    clear_cache()
+    try:
+        assert find_compiler("latexmk") is None
+        assert find_compiler("pdflatex") == path
+        assert available_compilers() == [("pdflatex", ["-recorder"])]
+
+        (tmp_path / "notes.txt").write_text("Not an output")
+        doc = Document(str(tmp_path / "doc"))
+        doc.generate_pdf()
+    finally:
+        clear_cache()
+
+    assert (tmp_path / "args").read_text().strip() == "-recorder"
+    assert sorted(os.listdir(str(tmp_path))) == ["args", "bin", "doc.pdf", "notes.txt"]
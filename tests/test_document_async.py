@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+import asyncio
+import os
+import subprocess
+import time
+
+import pytest
+
+from pylatex import Document
+from pylatex.errors import CompilerError
+
+
+def test_generate_pdf_async(tmp_path, capsys, fake_compiler):
+    compiler = fake_compiler('echo "[1] [2]"\ncp "$tex" "${tex%.tex}.pdf"\n')
+    docs = [Document(str(tmp_path / name)) for name in ("first", "second")]
+
+    async def main():
+        await asyncio.gather(
+            *(doc.generate_pdf_async(compiler=compiler, silent=False) for doc in docs)
+        )
+
+    asyncio.run(main())
+
+    assert (tmp_path / "first.pdf").exists()
+    assert (tmp_path / "second.pdf").exists()
+    assert capsys.readouterr().out == "[1] [2]\n[1] [2]\n"
+
+
+def test_generate_pdf_async_errors(tmp_path, capsys, fake_compiler):
+    doc = Document(str(tmp_path / "doc"))
+
+    with pytest.raises(CompilerError):
+        asyncio.run(doc.generate_pdf_async(compiler=str(tmp_path / "missing")))
+
+    compiler = fake_compiler("echo broken\nexit 1\n")
+    with pytest.raises(subprocess.CalledProcessError):
+        asyncio.run(doc.generate_pdf_async(compiler=compiler))
+    assert capsys.readouterr().out == "broken\n\n"
+
+
+def test_generate_pdf_async_cancel(tmp_path, fake_compiler):
+    pid_file = tmp_path / "pid"
+    compiler = fake_compiler('sleep 30 &\necho $! > "{}"\nwait\n'.format(pid_file))
+    doc = Document(str(tmp_path / "doc"))
+
+    async def main():
+        task = asyncio.ensure_future(doc.generate_pdf_async(compiler=compiler))
+        while not pid_file.exists() or not pid_file.read_text().strip():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+    # The process started by the compiler is killed as well
+    pid = int(pid_file.read_text())
+    for _ in range(100):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            break
+        with open("/proc/{}/stat".format(pid)) as f:
+            if f.read().split()[2] == "Z":
+                break
+        time.sleep(0.01)
+    else:
+        pytest.fail("The compiler was not killed")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+import os
+
+from pylatex import Axis, Document, Figure, Plot, TikZ
+from pylatex.utils import TempWorkspace
+
+# Copies the tex file and counts its runs
+_copying = 'echo run >> "$(dirname "$tex")/runs"\ncp "$tex" "${tex%.tex}.pdf"\n'
+
+
+def _runs(directory):
+    with open(os.path.join(str(directory), "runs")) as f:
+        return len(f.readlines())
+
+
+def test_build_cache(tmp_path, monkeypatch, fake_compiler):
+    monkeypatch.setenv("PYLATEX_CACHE_DIR", str(tmp_path / "cache"))
+    compiler = fake_compiler(_copying)
+    image = tmp_path / "image.png"
+    image.write_bytes(b"first")
+
+    doc = Document(str(tmp_path / "report"))
+    with doc.create(Figure()) as fig:
+        fig.add_image(str(image))
+
+    doc.generate_pdf(compiler=compiler, build_cache=True)
+    doc.generate_pdf(compiler=compiler, build_cache=True)
+    assert _runs(tmp_path) == 1
+    assert (tmp_path / "report.pdf").read_text() == doc.dumps()
+    assert not (tmp_path / "report.tex").exists()
+
+    # Other arguments or a changed image need a new build
+    doc.generate_pdf(compiler=compiler, compiler_args=["-x"], build_cache=True)
+    assert _runs(tmp_path) == 2
+
+    image.write_bytes(b"second")
+    doc.generate_pdf(compiler=compiler, build_cache=True)
+    assert _runs(tmp_path) == 3
+
+    # So do options that change the output
+    doc.generate_pdf(compiler=compiler, build_cache=True, plan_passes=True)
+    assert _runs(tmp_path) == 4
+
+    # A compiler must not write into a PDF that is linked from the cache
+    doc.append("Changed")
+    doc.generate_pdf(compiler=compiler, build_cache=True)
+    assert _runs(tmp_path) == 5
+    cached = [path.read_text() for path in (tmp_path / "cache" / "pdf").iterdir()]
+    assert len(cached) == 5
+    assert sum("Changed" in content for content in cached) == 1
+
+
+def test_unchanged_tex_not_rewritten(tmp_path):
+    doc = Document(str(tmp_path / "report"))
+    doc.append("Hello")
+
+    doc.generate_tex()
+    filepath = str(tmp_path / "report.tex")
+    os.utime(filepath, (0, 0))
+
+    doc.generate_tex()
+    assert os.stat(filepath).st_mtime == 0
+
+    doc.append("World")
+    doc.generate_tex()
+    assert os.stat(filepath).st_mtime != 0
+
+
+def _plot_report(filepath):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    doc = Document(filepath)
+    with doc.create(TikZ()) as tikz:
+        with tikz.create(Axis()) as axis:
+            axis.append(Plot(coordinates=[(0, 1), (1, 2)], data_file=True))
+
+    plt.figure()
+    plt.plot([1, 2, 3])
+    with doc.create(Figure()) as fig:
+        fig.add_plot(close=True)
+    return doc
+
+
+def test_build_cache_workspaces(tmp_path, monkeypatch, fake_compiler):
+    # The same report in another workspace, like in a new process, has
+    # other paths for its plots.
+    monkeypatch.setenv("PYLATEX_CACHE_DIR", str(tmp_path / "cache"))
+    compiler = fake_compiler(_copying)
+
+    for _ in range(2):
+        with TempWorkspace().use():
+            doc = _plot_report(str(tmp_path / "report"))
+            doc.generate_pdf(compiler=compiler, build_cache=True)
+    assert _runs(tmp_path) == 1
+
+    with TempWorkspace().use():
+        doc = _plot_report(str(tmp_path / "report"))
+        doc.append("Changed")
+        doc.generate_pdf(compiler=compiler, build_cache=True)
+    assert _runs(tmp_path) == 2
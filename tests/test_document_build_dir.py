@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+import os
+
+from pylatex import Document
+
+# Writes its output to the output directory, and the table of contents once
+_writing = (
+    'cp "$tex" "$out/$job.pdf"\n'
+    'echo run >> "$out/runs"\n'
+    '[ -f "$out/$job.toc" ] || echo toc > "$out/$job.toc"\n'
+)
+
+
+def test_build_dir(tmp_path, fake_compiler):
+    compiler = fake_compiler(_writing)
+    build_dir = tmp_path / "build"
+
+    doc = Document(str(tmp_path / "out" / "report"))
+    doc.append("Hello")
+    os.makedirs(str(tmp_path / "out"))
+
+    for _ in range(2):
+        doc.generate_pdf(compiler=compiler, build_dir=str(build_dir))
+
+    assert (tmp_path / "out" / "report.pdf").read_text() == doc.dumps()
+    assert not (tmp_path / "out" / "report.toc").exists()
+    # The auxiliary files are kept for the next run, which then doesn't
+    # have to run the compiler twice
+    assert (build_dir / "report.toc").read_text() == "toc\n"
+    assert (build_dir / "runs").read_text().count("run") == 3
+    assert (build_dir / "report.pdf").exists()
+
+
+def test_managed_build_dir(tmp_path, monkeypatch, fake_compiler):
+    monkeypatch.setenv("PYLATEX_CACHE_DIR", str(tmp_path / "cache"))
+    compiler = fake_compiler(_writing)
+
+    doc = Document(str(tmp_path / "report"))
+    doc.generate_pdf(compiler=compiler, build_dir=True)
+
+    build_dirs = os.listdir(str(tmp_path / "cache" / "build"))
+    assert len(build_dirs) == 1
+    assert build_dirs[0].startswith("report-")
+    assert (tmp_path / "report.pdf").exists()
+
+    doc.clean_build_dir()
+    assert os.listdir(str(tmp_path / "cache" / "build")) == []
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+import asyncio
+import os
+import pickle
+import time
+
+import pytest
+
+from pylatex import Document
+from pylatex.errors import CompilerTimeoutError
+
+_hanging = (
+    'echo "! Undefined control sequence." > doc.log\n'
+    'echo "(./doc.tex [1] [2]"\n'
+    "sleep 30\n"
+)
+
+
+def test_timeout(tmp_path, fake_compiler):
+    doc = Document(str(tmp_path / "doc"))
+
+    start = time.monotonic()
+    with pytest.raises(CompilerTimeoutError) as excinfo:
+        doc.generate_pdf(compiler=fake_compiler(_hanging), timeout=0.5)
+
+    assert time.monotonic() - start < 10
+    assert excinfo.value.output == b"(./doc.tex [1] [2]\n"
+    assert len(excinfo.value.log.errors) == 1
+
+    error = pickle.loads(pickle.dumps(excinfo.value))
+    assert error.output == excinfo.value.output
+
+
+def test_timeout_async(tmp_path, fake_compiler):
+    doc = Document(str(tmp_path / "doc"))
+
+    with pytest.raises(CompilerTimeoutError) as excinfo:
+        asyncio.run(
+            doc.generate_pdf_async(compiler=fake_compiler(_hanging), timeout=0.5)
+        )
+
+    assert excinfo.value.output == b"(./doc.tex [1] [2]\n"
+
+
+def test_cpu_time(tmp_path, fake_compiler):
+    doc = Document(str(tmp_path / "doc"))
+    compiler = fake_compiler("while :; do :; done\n")
+
+    with pytest.raises(CompilerTimeoutError):
+        doc.generate_pdf(compiler=compiler, cpu_time=1, timeout=20)
+
+
+def test_limits_not_posix(tmp_path, monkeypatch, fake_compiler):
+    monkeypatch.setattr(os, "name", "nt")
+    doc = Document(str(tmp_path / "doc"))
+
+    with pytest.raises(ValueError):
+        doc.generate_pdf(compiler=fake_compiler(""), memory_limit=10**9)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+import asyncio
+import subprocess
+
+import pytest
+
+from pylatex import Document
+
+_printing = (
+    'echo "This is a fake TeX"\n'
+    'echo "(./doc.aux) [1{/usr/share/pdftex.map}] [2]"\n'
+    'echo "[3 <./plot.png>] [10pt]"\n'
+    "touch doc.pdf\n"
+)
+
+
+def test_output_callbacks(tmp_path, fake_compiler):
+    lines = []
+    progress = []
+
+    doc = Document(str(tmp_path / "doc"))
+    doc.generate_pdf(
+        compiler=fake_compiler(_printing),
+        output_callback=lines.append,
+        output_log=str(tmp_path / "output.txt"),
+        progress_callback=lambda *event: progress.append(event),
+    )
+
+    assert lines[0] == "This is a fake TeX"
+    assert len(lines) == 3
+    assert progress == [(1, 1), (1, 2), (1, 3)]
+    assert (tmp_path / "output.txt").read_text().splitlines() == lines
+
+
+def test_output_async(tmp_path, fake_compiler):
+    progress = []
+
+    doc = Document(str(tmp_path / "doc"))
+    asyncio.run(
+        doc.generate_pdf_async(
+            compiler=fake_compiler(_printing),
+            progress_callback=lambda *event: progress.append(event),
+        )
+    )
+
+    assert progress == [(1, 1), (1, 2), (1, 3)]
+
+
+def test_output_of_failure(tmp_path, capsys, fake_compiler):
+    doc = Document(str(tmp_path / "doc"))
+
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        doc.generate_pdf(compiler=fake_compiler(_printing + "exit 1\n"))
+
+    assert excinfo.value.output.startswith(b"This is a fake TeX\n")
+    assert "This is a fake TeX" in capsys.readouterr().out
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+import os
+import subprocess
+
+import pytest
+
+import pylatex.document
+from pylatex import Document, Figure
+
+
+def test_generate_pdf_bytes(tmp_path, monkeypatch, fake_compiler):
+    shm = tmp_path / "shm"
+    shm.mkdir()
+    monkeypatch.setattr(pylatex.document, "_tmpfs_dir", lambda: str(shm))
+    monkeypatch.chdir(str(tmp_path))
+
+    doc = Document("report")
+    doc.append("Hello")
+
+    compiler = fake_compiler('cp "$tex" "${tex%.tex}.pdf"\n')
+    assert doc.generate_pdf_bytes(compiler=compiler) == doc.dumps().encode()
+    assert os.listdir(str(shm)) == []
+    assert not (tmp_path / "report.tex").exists()
+
+    compiler = fake_compiler("exit 1\n")
+    with pytest.raises(subprocess.CalledProcessError):
+        doc.generate_pdf_bytes(compiler=compiler)
+    assert os.listdir(str(shm)) == []
+
+
+def test_generate_pdf_bytes_relative_images(tmp_path, monkeypatch, fake_compiler):
+    monkeypatch.setattr(pylatex.document, "_tmpfs_dir", lambda: str(tmp_path))
+    (tmp_path / "work").mkdir()
+    (tmp_path / "shared").mkdir()
+    (tmp_path / "work" / "kitten.jpg").write_text("kitten\n")
+    (tmp_path / "shared" / "logo.png").write_text("logo\n")
+    monkeypatch.chdir(str(tmp_path / "work"))
+
+    doc = Document("report")
+    with doc.create(Figure()) as fig:
+        fig.add_image("kitten.jpg")
+        fig.add_image("../shared/logo.png")
+
+    # The images are found relative to the directory the compiler runs in
+    compiler = fake_compiler('cat kitten.jpg ../shared/logo.png > "${tex%.tex}.pdf"\n')
+    assert doc.generate_pdf_bytes(compiler=compiler) == b"kitten\nlogo\n"
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import asyncio
+import io
+
+import pytest
+
+from pylatex import Document, Section
+from pylatex.utils import italic
+
+# Writes its standard input to the PDF
+_reading = 'cat > "$job.pdf"\n'
+
+
+def _document(filepath=None):
+    doc = Document(filepath, documentclass="report")
+    doc.append("Some text")
+    with doc.create(Section("A section")):
+        doc.append(italic("More text"))
+    return doc
+
+
+def test_iter_dumps():
+    doc = _document()
+    assert "".join(doc.iter_dumps()) == doc.dumps()
+
+    file_w = io.StringIO()
+    doc.dump(file_w)
+    assert file_w.getvalue() == doc.dumps()
+
+    assert "".join(Document().iter_dumps()) == Document().dumps()
+
+
+def test_generate_pdf_stdin(tmp_path, fake_compiler):
+    compiler = fake_compiler(_reading)
+    doc = _document(str(tmp_path / "report"))
+
+    doc.generate_pdf(compiler=compiler, stdin=True)
+    assert (tmp_path / "report.pdf").read_text() == doc.dumps()
+    assert not (tmp_path / "report.tex").exists()
+
+    (tmp_path / "report.pdf").unlink()
+    asyncio.run(doc.generate_pdf_async(compiler=compiler, stdin=True))
+    assert (tmp_path / "report.pdf").read_text() == doc.dumps()
+
+    with pytest.raises(ValueError):
+        doc.generate_pdf(compiler="latexmk", stdin=True)
+
+
+def test_generate_pdf_stdin_cache_hit(tmp_path, monkeypatch, fake_compiler):
+    monkeypatch.setenv("PYLATEX_CACHE_DIR", str(tmp_path / "cache"))
+    compiler = fake_compiler(_reading)
+    doc = _document(str(tmp_path / "report"))
+
+    doc.generate_pdf(compiler=compiler, stdin=True, build_cache=True, clean=False)
+    doc.generate_pdf(compiler=compiler, stdin=True, build_cache=True, clean=False)
+    asyncio.run(
+        doc.generate_pdf_async(
+            compiler=compiler, stdin=True, build_cache=True, clean=False
+        )
+    )
+    assert (tmp_path / "report.pdf").read_text() == doc.dumps()
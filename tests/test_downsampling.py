@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+import math
+
+from pylatex import Plot, TikZDraw
+from pylatex.downsampling import (
+    douglas_peucker_indices,
+    lttb_indices,
+    max_points_for_width,
+    min_max_indices,
+)
+
+
+def test_indices():
+    x = list(range(1000))
+    y = [math.sin(i / 10) for i in x]
+
+    for method in (lttb_indices, min_max_indices):
+        indices = method(x, y, 100).tolist()
+        assert len(indices) <= 100
+        assert indices[0] == 0
+        assert indices[-1] == 999
+        assert indices == sorted(indices)
+
+    # Nothing to do when there are fewer points than requested
+    assert lttb_indices(x, y, 2000).tolist() == x
+
+    line = [(i, 2 * i) for i in range(100)]
+    assert douglas_peucker_indices(line, tolerance=0.01).tolist() == [0, 99]
+
+
+def test_plot():
+    coordinates = [(i, math.sin(i / 10)) for i in range(5000)]
+
+    plot = Plot(coordinates=coordinates, downsample="lttb", max_points=50)
+    assert plot.dumps().count("%\n(") == 50
+
+    plot = Plot(coordinates=coordinates, downsample="minmax")
+    assert plot.dumps().count("%\n(") <= max_points_for_width()
+
+
+def test_tikz_simplify():
+    draw = TikZDraw([(0, 0), "--", (1, 0.00001), "--", (2, 0), "rectangle", (3, 3)])
+    draw.simplify()
+
+    assert draw.dumps() == r"\path[draw] (0.0,0.0) -- (2.0,0.0) rectangle (3.0,3.0);"
+
+
+if __name__ == "__main__":
+    test_indices()
+    test_plot()
+    test_tikz_simplify()
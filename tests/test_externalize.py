@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+import hashlib
+import os
+
+from pylatex import Document, Package, TikZ, TikZDraw
+from pylatex.externalize import dumps_standalone, externalize_pictures
+
+
+def test_externalize_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYLATEX_CACHE_DIR", str(tmp_path))
+
+    doc = Document()
+    doc.packages.append(Package("siunitx"))
+    with doc.create(TikZ(externalize=True)) as pic:
+        pic.append(TikZDraw([(0, 0), "--", (1, 1)]))
+    doc.append(TikZ(data=[TikZDraw([(0, 0), "--", (2, 2)])]))
+
+    doc._propagate_packages()
+    source = dumps_standalone(pic, packages=doc.packages)
+    assert source.startswith(r"\documentclass{standalone}")
+    assert r"\begin{tikzpicture}" in source
+    # The pictures use the packages of the document
+    assert r"\usepackage{siunitx}" in source
+
+    # Pretend the picture was compiled before, so no compiler is needed
+    key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    filepath = os.path.join(str(tmp_path), "tikz", key + ".pdf")
+    os.makedirs(os.path.dirname(filepath))
+    open(filepath, "wb").close()
+
+    externalize_pictures(doc)
+
+    assert pic.externalized_file == filepath
+    string = doc.dumps()
+    assert r"\includegraphics{" + filepath + "}" in string
+    assert r"\usepackage{graphicx}" in string
+    # Pictures without externalize are left alone
+    assert string.count(r"\begin{tikzpicture}") == 1
+
+    # The picture is still in the cache in the next build
+    externalize_pictures(doc, compiler="missinglatex")
+    assert pic.externalized_file == filepath
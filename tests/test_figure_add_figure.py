@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+import os
+import re
+
+import matplotlib
+
+matplotlib.use("Agg")  # Not to use X server. For TravisCI.
+import matplotlib.figure  # noqa
+import matplotlib.pyplot as pyplot  # noqa
+
+from pylatex import Figure  # noqa
+
+
+def _filepath(figure):
+    return re.search(r"includegraphics\[.*\]{(.*)}", figure.dumps()).group(1)
+
+
+def test_add_figure():
+    plot = matplotlib.figure.Figure()
+    plot.add_subplot().plot([0, 1, 2], [2, 0, 1])
+
+    figure = Figure()
+    figure.add_figure(plot, width="4cm")
+
+    assert r"\includegraphics[width=4cm]" in figure.dumps()
+    assert os.path.getsize(_filepath(figure)) > 0
+
+
+def test_add_plot_close():
+    pyplot.figure()
+    pyplot.plot([0, 1, 2], [2, 0, 1])
+    number = pyplot.gcf().number
+
+    figure = Figure()
+    figure.add_plot(close=True)
+
+    assert number not in pyplot.get_fignums()
+    assert os.path.getsize(_filepath(figure)) > 0
+
+
+if __name__ == "__main__":
+    test_add_figure()
+    test_add_plot_close()
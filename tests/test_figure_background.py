@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+
+import os
+import re
+
+import matplotlib
+
+matplotlib.use("Agg")  # Not to use X server. For TravisCI.
+import matplotlib.pyplot as pyplot  # noqa
+
+from pylatex import Figure  # noqa
+from pylatex.figure import wait_for_plots  # noqa
+
+
+def test_background_plot():
+    pyplot.figure()
+    pyplot.plot([0, 1, 2], [2, 0, 1])
+
+    figure = Figure()
+    figure.add_plot(background=True, width="5cm")
+    pyplot.close()
+
+    wait_for_plots()
+
+    filepath = re.search(r"includegraphics\[width=5cm\]{(.*)}", figure.dumps())
+    assert os.path.getsize(filepath.group(1)) > 0
+
+
+if __name__ == "__main__":
+    test_background_plot()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import os
+import re
+
+import matplotlib
+
+matplotlib.use("Agg")  # Not to use X server. For TravisCI.
+import matplotlib.pyplot as pyplot  # noqa
+
+import pylatex.figure  # noqa
+from pylatex import Figure  # noqa
+
+
+def _cached_plot(y):
+    pyplot.figure()
+    pyplot.plot([0, 1, 2], y)
+
+    figure = Figure()
+    figure.add_plot(cache=True)
+    pyplot.close()
+
+    return re.search(r"includegraphics\[.*\]{(.*)}", figure.dumps()).group(1)
+
+
+def test_plot_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYLATEX_CACHE_DIR", str(tmp_path))
+
+    first = _cached_plot([2, 0, 1])
+    assert first.startswith(str(tmp_path))
+    assert os.path.isfile(first)
+
+    # The same plot is stored only once
+    assert _cached_plot([2, 0, 1]) == first
+    assert len(os.listdir(os.path.dirname(first))) == 1
+
+    second = _cached_plot([2, 0, 2])
+    assert second != first
+
+    # The least recently used plot is removed when the cache is too large
+    size = os.path.getsize(second)
+    monkeypatch.setattr(pylatex.figure, "plot_cache_size", size)
+    os.utime(first, (0, 0))
+    _cached_plot([1, 1, 1])
+    assert not os.path.exists(first)
+    assert os.path.exists(second)
+
+
+def test_plot_cache_key_style():
+    def key(draw):
+        figure = pyplot.figure()
+        draw(figure.gca())
+        key = pylatex.figure._plot_cache_key(figure, (), {}, ".pdf")
+        pyplot.close(figure)
+        return key
+
+    bars = key(lambda axes: axes.bar([1, 2], [3, 4]))
+    assert key(lambda axes: axes.bar([1, 2], [3, 4])) == bars
+    assert key(lambda axes: axes.bar([1, 2], [3, 4], hatch="//")) != bars
+
+    title = key(lambda axes: axes.set_title("Title"))
+    assert key(lambda axes: axes.set_title("Title", fontweight="bold")) != title
+
+    with matplotlib.rc_context({"lines.antialiased": False}):
+        assert key(lambda axes: axes.bar([1, 2], [3, 4])) != bars
+
+
+def test_plot_cache_key_tick_labels():
+    from matplotlib.ticker import FixedFormatter, FixedLocator
+
+    # The offset text of an axis is only set when the figure is drawn
+    def key(offset):
+        figure = pyplot.figure()
+        axes = figure.gca()
+        axes.plot([0, 1, 2], [2, 0, 1])
+        formatter = FixedFormatter(["a", "b", "c"])
+        formatter.set_offset_string(offset)
+        axes.xaxis.set_major_locator(FixedLocator([0, 1, 2]))
+        axes.xaxis.set_major_formatter(formatter)
+        key = pylatex.figure._plot_cache_key(figure, (), {}, ".pdf")
+        pyplot.close(figure)
+        return key
+
+    assert key("x") == key("x")
+    assert key("x") != key("y")
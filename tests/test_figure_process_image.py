@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+import os
+import re
+
+from PIL import Image
+
+from pylatex import Figure
+from pylatex.figure import wait_for_plots
+
+
+def test_process_image(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYLATEX_CACHE_DIR", str(tmp_path / "cache"))
+
+    filename = str(tmp_path / "large.png")
+    Image.new("RGB", (4000, 1000), "red").save(filename)
+
+    figure = Figure()
+    figure.add_image(filename, width="1in", dpi=100, process=True)
+    figure.add_image(filename, width="1in", dpi=100, process=True)
+    wait_for_plots()
+
+    processed = re.findall(r"includegraphics\[width=1in\]{(.*)}", figure.dumps())
+    assert processed[0] == processed[1]
+    assert processed[0].startswith(str(tmp_path / "cache"))
+
+    with Image.open(processed[0]) as image:
+        assert image.size == (100, 25)
+
+
+def test_process_image_not_raster():
+    figure = Figure()
+    figure.add_image("plot.pdf", process=True)
+
+    assert "{plot.pdf}" in figure.dumps()
+
+
+def test_process_image_cmyk(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYLATEX_CACHE_DIR", str(tmp_path / "cache"))
+
+    filename = str(tmp_path / "print.tif")
+    Image.new("CMYK", (400, 100), (0, 255, 255, 0)).save(filename)
+
+    figure = Figure()
+    figure.add_image(filename, width="1in", dpi=100, process=True)
+    wait_for_plots()
+
+    processed = re.search(r"includegraphics\[width=1in\]{(.*)}", figure.dumps())
+    with Image.open(processed.group(1)) as image:
+        assert image.format == "PNG"
+        assert image.mode == "RGB"
+        assert image.size == (100, 25)
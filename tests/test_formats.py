@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+import os
+
+from pylatex import Document
+from pylatex.formats import build_format
+
+# Writes format files and logs the formats it uses
+_engine = (
+    'if [ "$1" = --version ]; then echo "FakeTeX 1.0"; exit; fi\n'
+    'if [ "$1" = -ini ]; then\n'
+    '  echo ini >> "$(dirname "$0")/log"\n'
+    '  cp "$tex" "$job.fmt"\n'
+    "else\n"
+    '  echo "$fmt $TEXFORMATS" >> "$(dirname "$0")/log"\n'
+    '  cp "$tex" "${tex%.tex}.pdf"\n'
+    "fi\n"
+)
+
+
+def test_preamble_format(tmp_path, monkeypatch, fake_compiler):
+    monkeypatch.setenv("PYLATEX_CACHE_DIR", str(tmp_path / "cache"))
+    engine = fake_compiler(_engine)
+    format_dir = str(tmp_path / "cache" / "formats")
+
+    for text in ("first", "second"):
+        doc = Document(str(tmp_path / text))
+        doc.append(text)
+        doc.generate_pdf(compiler=engine, preamble_format=True)
+        assert (tmp_path / (text + ".pdf")).exists()
+
+    name = build_format(doc.dumps_preamble(), engine)
+    with open(os.path.join(format_dir, name + ".fmt")) as f:
+        assert f.read().startswith(doc.dumps_preamble())
+
+    # The format is only built once for both documents
+    assert (tmp_path / "log").read_text().splitlines() == [
+        "ini",
+        name + " " + format_dir + os.pathsep,
+        name + " " + format_dir + os.pathsep,
+    ]
+
+    doc.packages.append("siunitx")
+    assert build_format(doc.dumps_preamble(), engine) != name
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+
+from pylatex import Document
+from pylatex.log import parse_log
+
+LOG = r"""This is pdfTeX, Version 3.141592653-2.6-1.40.25 (TeX Live 2023)
+(./report.tex
+LaTeX2e <2022-11-01> patch level 1
+(/usr/share/texlive/texmf-dist/tex/latex/base/article.cls
+Document Class: article 2022/07/02 v1.4n Standard LaTeX document class
+(/usr/share/texlive/texmf-dist/tex/latex/base/size10.clo))
+
+Package hyperref Warning: Token not allowed in a PDF string (Unicode):
+(hyperref)                removing `\textbf' on input line 12.
+
+Underfull \hbox (badness 10000) in paragraph at lines 20--21
+
+ []
+
+[1{/var/lib/texmf/fonts/map/pdftex/updmap/pdftex.map}]
+(./chapter.tex
+Overfull \vbox (4.0pt too high) detected at line 3
+./chapter.tex:5: Undefined control sequence.
+l.5 \foo
+)
+LaTeX Warning: Label(s) may have changed. Rerun to get cross-references right.
+
+ )
+Output written on report.pdf (1 page, 1234 bytes).
+"""
+
+
+def test_parse_log():
+    log = parse_log(LOG)
+
+    assert [(e.file, e.line) for e in log.warnings] == [
+        ("./report.tex", 12),
+        ("./report.tex", None),
+    ]
+    assert log.warnings[0].package == "hyperref"
+    assert log.warnings[0].message.endswith("removing `\\textbf' on input line 12.")
+
+    assert [(e.file, e.line) for e in log.bad_boxes] == [
+        ("./report.tex", 20),
+        ("./chapter.tex", 3),
+    ]
+    assert [str(e) for e in log.errors] == [
+        "./chapter.tex:5: Undefined control sequence."
+    ]
+    assert log.rerun_needed
+
+    long_line = "Package foo Warning: " + "x" * 58
+    log = parse_log(long_line + "\nRerun LaTeX.\n")
+    assert log.warnings[0].message == "x" * 58 + "Rerun LaTeX."
+
+    log = parse_log("(./report.tex\nNo file report.toc.\n)\n")
+    assert log.missing_files == ["report.toc"]
+    assert log.rerun_needed
+    assert not parse_log("No file chapter.tex.\n").rerun_needed
+    assert not parse_log("No file report.aux.\n").rerun_needed
+
+
+def test_reruns(tmp_path, fake_compiler):
+    # The log asks for a rerun in the first two passes
+    path = fake_compiler(
+        'echo run >> "$(dirname "$0")/runs"\n'
+        'if [ "$(wc -l < "$(dirname "$0")/runs")" -lt 3 ]; then\n'
+        '  echo "LaTeX Warning: Label(s) may have changed. Rerun." > report.log\n'
+        "else\n"
+        "  echo > report.log\n"
+        "fi\n"
+        "touch report.pdf\n"
+    )
+
+    doc = Document(str(tmp_path / "report"))
+    doc.generate_pdf(compiler=path)
+    assert (tmp_path / "runs").read_text().count("run") == 3
+
+
+def test_single_pass_without_references(tmp_path, fake_compiler):
+    # Like pdflatex, that creates the aux file and adds to it in every pass
+    path = fake_compiler(
+        'echo run >> "$(dirname "$0")/runs"\n'
+        'echo "No file report.aux." > report.log\n'
+        "echo relax >> report.aux\n"
+        "touch report.pdf\n"
+    )
+
+    doc = Document(str(tmp_path / "report"))
+    doc.append("Some text")
+    doc.generate_pdf(compiler=path)
+    assert (tmp_path / "runs").read_text().count("run") == 1
+
+    # An aux file that changes is read again
+    doc.generate_pdf(compiler=path, clean=False)
+    doc.generate_pdf(compiler=path)
+    assert (tmp_path / "runs").read_text().count("run") > 3
+
+
+def test_reruns_changed_toc(tmp_path, fake_compiler):
+    # The table of contents changes in the first two passes, without a
+    # warning in the log
+    path = fake_compiler(
+        'echo run >> "$(dirname "$0")/runs"\n'
+        'if [ "$(wc -l < "$(dirname "$0")/runs")" -lt 3 ]; then\n'
+        "  echo entry >> report.toc\n"
+        "fi\n"
+        "echo > report.log\n"
+        "touch report.pdf\n"
+    )
+
+    doc = Document(str(tmp_path / "report"))
+    doc.generate_pdf(compiler=path)
+    assert (tmp_path / "runs").read_text().count("run") == 3
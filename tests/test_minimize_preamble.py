@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+from pylatex import (
+    Document,
+    NoEscape,
+    PageStyle,
+    Tabularx,
+    simple_page_number,
+)
+from pylatex.analysis import unused_packages
+from pylatex.headfoot import Foot
+
+
+def _names(packages):
+    return [p.arguments._positional_args[0] for p in packages]
+
+
+def test_minimize_preamble():
+    doc = Document()
+    with doc.create(Tabularx("lX")) as table:
+        table.add_row(("a", "b"))
+
+    pruned = doc.minimize_preamble()
+    assert _names(pruned) == ["fontenc", "inputenc", "lmodern", "textcomp", "lastpage"]
+
+    preamble = doc.dumps_preamble()
+    assert "fontenc" not in preamble
+    assert "lastpage" not in preamble
+    assert r"\usepackage{tabularx}" in preamble
+
+
+def test_needed_packages():
+    doc = Document()
+    page_style = PageStyle("footer")
+    with page_style.create(Foot("C")):
+        page_style.append(simple_page_number())
+    doc.preamble.append(page_style)
+    doc.append(NoEscape(r"Price: 5\texteuro{}"))
+
+    assert _names(unused_packages(doc)) == ["fontenc", "inputenc", "lmodern"]
+
+    doc = Document(fontenc=None)
+    doc.append("a < b")
+    assert "lmodern" in _names(unused_packages(doc))
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+import os
+
+from pylatex import Plot
+
+
+def test_data_file():
+    coordinates = [(0, 1), (1, 2.5), (2, -3)]
+
+    plot = Plot(coordinates=coordinates, data_file=True)
+    string = plot.dumps()
+
+    assert string.startswith(r"\addplot table {")
+    assert "coordinates" not in string
+
+    filepath = string[string.index("{") + 1 : string.index("}")]
+    with open(filepath, "rb") as f:
+        assert f.read() == b"0 1\n1 2.5\n2 -3\n"
+
+    # The same data is only written once
+    same = Plot(coordinates=list(coordinates), data_file=True, options="red")
+    assert filepath in same.dumps()
+
+
+def test_data_file_error_bar():
+    plot = Plot(coordinates=[(0, 1)], error_bar=[(0.5, 0.25)], data_file=True)
+    string = plot.dumps()
+
+    assert "table[x error index=2,y error index=3]" in string
+
+    filepath = string[string.index(" {") + 2 : string.index("}")]
+    assert os.path.isfile(filepath)
+
+
+if __name__ == "__main__":
+    test_data_file()
+    test_data_file_error_bar()
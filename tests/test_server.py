@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+import os
+import subprocess
+import threading
+
+import pytest
+
+from pylatex import Document, Figure
+from pylatex.errors import CompilerError
+from pylatex.server import CompileServer, _compile_job
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = CompileServer(
+        str(tmp_path / "pylatex.sock"),
+        max_workers=2,
+        compilers=[os.path.join(str(tmp_path), "fakelatex")],
+    )
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.close()
+
+
+def test_remote(tmp_path, server, fake_compiler):
+    # The compiler appends the image, which the server received as an asset
+    compiler = fake_compiler('cat "$tex" images/pic.png > "${tex%.tex}.pdf"\n')
+    (tmp_path / "images").mkdir()
+    (tmp_path / "images" / "pic.png").write_bytes(b"image")
+
+    doc = Document(str(tmp_path / "out"))
+    with doc.create(Figure()) as fig:
+        fig.add_image("images/pic.png")
+
+    doc.generate_pdf(remote=server.address, compiler=compiler)
+
+    assert (tmp_path / "out.pdf").read_text() == doc.dumps() + "image"
+    assert not (tmp_path / "out.tex").exists()
+
+
+def test_remote_errors(tmp_path, server, fake_compiler):
+    doc = Document(str(tmp_path / "out"))
+
+    compiler = fake_compiler("echo broken\nexit 3\n")
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        doc.generate_pdf(remote=server.address, compiler=compiler)
+    assert e.value.returncode == 3
+    assert e.value.output == b"broken\n"
+    assert not (tmp_path / "out.pdf").exists()
+
+
+def test_remote_options(tmp_path, server, fake_compiler):
+    doc = Document(str(tmp_path / "out"))
+
+    with pytest.raises(CompilerError, match="not allowed"):
+        doc.generate_pdf(remote=server.address, compiler="/bin/sh")
+
+    compiler = fake_compiler('cp "$tex" "${tex%.tex}.pdf"\n')
+    with pytest.raises(CompilerError, match="arguments are not allowed"):
+        doc.generate_pdf(
+            remote=server.address, compiler=compiler, compiler_args=["-shell-escape"]
+        )
+
+    header = {
+        "source": "",
+        "preamble": None,
+        "assets": [],
+        "options": {"compiler": compiler, "build_dir": "/"},
+    }
+    with pytest.raises(ValueError, match="build_dir"):
+        _compile_job(header, [], [compiler])
+
+
+def test_remote_build_cache_absolute_image(
+    tmp_path, server, monkeypatch, fake_compiler
+):
+    # The server reads images with an absolute path itself, and the build
+    # cache has to notice when they change
+    monkeypatch.setenv("PYLATEX_CACHE_DIR", str(tmp_path / "cache"))
+    compiler = fake_compiler('cat "$IMAGE" > "${tex%.tex}.pdf"\n')
+    image = tmp_path / "pic.png"
+    monkeypatch.setenv("IMAGE", str(image))
+
+    doc = Document(str(tmp_path / "out"))
+    with doc.create(Figure()) as fig:
+        fig.add_image(str(image))
+
+    for content in ["first", "second"]:
+        image.write_text(content)
+        doc.generate_pdf(remote=server.address, compiler=compiler, build_cache=True)
+        assert (tmp_path / "out.pdf").read_text() == content
+
+
+def test_remote_build_cache_client_workspaces(tmp_path, monkeypatch, fake_compiler):
+    # Plots are in workspaces of the client with random names, the same plot
+    # in another workspace is a cache hit
+    monkeypatch.setenv("PYLATEX_CACHE_DIR", str(tmp_path / "cache"))
+    compiler = fake_compiler(
+        'echo run >> "$(dirname "$0")/runs"\ncp "$tex" "${tex%.tex}.pdf"\n'
+    )
+
+    for name in ["first", "second"]:
+        workspace = tmp_path / name
+        workspace.mkdir()
+        plot = workspace / "plot.pdf"
+        plot.write_bytes(b"plot")
+
+        header = {
+            "source": r"\includegraphics{" + str(plot) + "}",
+            "preamble": None,
+            "assets": [],
+            "files": [str(plot)],
+            "workspaces": [str(workspace)],
+            "options": {"compiler": compiler, "build_cache": True},
+        }
+        _compile_job(header, [], [compiler])
+
+    assert (tmp_path / "runs").read_text().count("run") == 1
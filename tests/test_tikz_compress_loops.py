@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+from pylatex import TikZ, TikZCoordinate, TikZDraw, TikZNode, TikZScope
+
+
+def test_compress_loops():
+    pic = TikZ(compress_loops=True)
+    pic.append(TikZDraw([(0, 0), "--", (1, 1)]))
+    for i in range(3):
+        pic.append(TikZNode(handle="n%d" % i, at=TikZCoordinate(i, 2), text="x"))
+    pic.append(TikZDraw([(0, 0), "--", (1, 1)]))
+
+    assert pic.dumps() == (
+        "\\begin{tikzpicture}%\n"
+        "\\path[draw] (0.0,0.0) -- (1.0,1.0);%\n"
+        "\\foreach \\pylatexloopa/\\pylatexloopb in {0/0.0,1/1.0,2/2.0}"
+        "{\\node (n\\pylatexloopa) at (\\pylatexloopb,2.0) {x};}%\n"
+        "\\path[draw] (0.0,0.0) -- (1.0,1.0);%\n"
+        "\\end{tikzpicture}"
+    )
+
+
+def test_short_runs_are_kept():
+    scope = TikZScope(compress_loops=True)
+    for i in range(2):
+        scope.append(TikZNode(at=TikZCoordinate(i, 0)))
+
+    assert "foreach" not in scope.dumps()
+
+    pic = TikZ()
+    for i in range(5):
+        pic.append(TikZNode(at=TikZCoordinate(i, 0)))
+
+    assert "foreach" not in pic.dumps()
+
+
+if __name__ == "__main__":
+    test_compress_loops()
+    test_short_runs_are_kept()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+
+from pylatex import TikZDraw, TikZPathList
+
+
+def test_from_points():
+    path = TikZPathList.from_points([(0, 0), (1, 1), (2, 0)], connector="to")
+    assert path.dumps() == "(0.0,0.0) to (1.0,1.0) to (2.0,0.0)"
+
+    path.translate(1, -1)
+    path.scale(2, 3)
+    assert path.dumps() == "(2.0,-3.0) to (4.0,0.0) to (6.0,-3.0)"
+
+    # Appending falls back to normal path elements
+    path.append("--")
+    path.append((0, 0))
+    assert path.dumps() == "(2.0,-3.0) to (4.0,0.0) to (6.0,-3.0) -- (0.0,0.0)"
+
+    draw = TikZDraw(TikZPathList.from_points([(0, 0), (1, 0), (2, 0)]))
+    draw.simplify()
+    assert draw.dumps() == r"\path[draw] (0.0,0.0) -- (2.0,0.0);"
+
+
+def test_transform_path_list():
+    path = TikZPathList((0, 0), "--", "++(1,1)")
+    path.translate(1, 2)
+    path.scale(2)
+    assert path.dumps() == "(2.0,4.0) -- ++(2.0,2.0)"
+
+
+if __name__ == "__main__":
+    test_from_points()
+    test_transform_path_list()
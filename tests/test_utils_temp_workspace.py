@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+import copy
+import gc
+import os
+import pickle
+import subprocess
+
+import pytest
+
+from pylatex import Document
+from pylatex.utils import TempWorkspace, current_workspace, make_temp_dir
+
+
+def test_reference_counting():
+    workspace = TempWorkspace()
+    first = Document(workspace=workspace)
+    second = Document(workspace=workspace)
+
+    path = workspace.path
+    assert os.path.isdir(path)
+
+    first.workspace.release()
+    assert os.path.isdir(path)
+
+    second.workspace.release()
+    assert not os.path.exists(path)
+
+
+def test_use():
+    workspace = TempWorkspace()
+
+    with workspace.use():
+        assert current_workspace() is workspace
+        doc = Document()
+        path = make_temp_dir()
+        assert path == workspace.path
+
+    assert current_workspace() is not workspace
+    # The document still holds a reference
+    assert doc.workspace is workspace
+    assert os.path.isdir(path)
+
+    doc.workspace.release()
+    assert not os.path.exists(path)
+
+
+def test_document_workspace():
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    from pylatex import Axis, Figure, Plot, TikZ
+
+    workspace = TempWorkspace()
+    doc = Document(workspace=workspace)
+
+    # Plots are saved when they are added, data files when they are rendered
+    plt.figure()
+    plt.plot([1, 2, 3])
+    with doc.create(Figure()) as fig:
+        fig.add_plot(close=True)
+    with doc.create(TikZ()) as tikz:
+        with tikz.create(Axis()) as axis:
+            axis.append(Plot(coordinates=[(0, 1), (1, 2)], data_file=True))
+    assert current_workspace() is not workspace
+
+    content = doc.dumps()
+    assert "".join(doc.iter_dumps()) == content
+    path = workspace.path
+    assert len(os.listdir(path)) == 2
+    for filename in os.listdir(path):
+        assert os.path.join(path, filename) in content
+
+    doc.workspace.release()
+    assert not os.path.exists(path)
+
+
+def test_pickle_document():
+    workspace = TempWorkspace()
+    doc = Document(workspace=workspace)
+    doc.append("Some text.")
+    path = workspace.path
+
+    for other in (pickle.loads(pickle.dumps(doc)), copy.deepcopy(doc)):
+        assert other.dumps() == doc.dumps()
+
+    # The deep copy shares the workspace and holds its own reference
+    other.workspace.release()
+    assert os.path.isdir(path)
+    doc.workspace.release()
+    assert not os.path.exists(path)
+
+
+def test_release_workspace(tmp_path, fake_compiler):
+    compiler = fake_compiler("exit 1\n")
+
+    # A failed build releases the workspace as well
+    workspace = TempWorkspace()
+    doc = Document(str(tmp_path / "doc"), workspace=workspace)
+    path = workspace.path
+    with pytest.raises(subprocess.CalledProcessError):
+        doc.generate_pdf(compiler=compiler)
+    assert not os.path.exists(path)
+
+    # A document that is only rendered releases it when it is collected
+    workspace = TempWorkspace()
+    doc = Document(workspace=workspace)
+    path = workspace.path
+    doc.dumps()
+    del doc
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+if __name__ == "__main__":
+    test_reference_counting()
+    test_use()
+    test_document_workspace()
+    test_pickle_document()
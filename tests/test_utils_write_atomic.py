@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+
+import os
+import threading
+
+from pylatex.utils import _write_atomic
+
+
+def test_concurrent_writes(tmp_path):
+    filepath = str(tmp_path / "file")
+    errors = []
+
+    def write():
+        for _ in range(200):
+            try:
+                _write_atomic(filepath, b"data")
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert os.listdir(str(tmp_path)) == ["file"]